@@ -2,6 +2,7 @@ GEMINI_API_KEY=your_api_key_here
 # Stripe
 STRIPE_KEY=sk_test_your_secret_key
 STRIPE_PUBLIC_KEY=pk_test_your_public_key
+STRIPE_WEBHOOK_SECRET=whsec_your_webhook_secret
 
 # Email (Gmail example)
 EMAIL_USER=your@gmail.com
@@ -0,0 +1,214 @@
+"""Admission control for expensive endpoints.
+
+Routes are grouped into classes (ENDPOINT_CLASSES). Each limited class has
+a concurrency limit and a bounded wait queue, so a burst of resume uploads
+or AI streams holds at most `concurrency` worker threads and cheap routes
+(dashboard, payment_success, ...) keep the rest. A request that finds the
+queue full, or waits longer than `max_wait`, gets an immediate 503; a
+logged-in user past their token bucket for the class gets 429. Both carry
+Retry-After. Anonymous requests (signups) have no bucket: behind NAT or a
+proxy many people share one address, so they're left to the concurrency
+limit and queue.
+
+Limits are per process: under gunicorn each worker enforces its own. A
+queued request still holds its thread while it waits, so the classes'
+combined concurrency plus queue must stay below the worker's thread count,
+or the flood takes every thread and cheap requests wait behind it anyway.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from metrics import registry
+
+# (endpoint, method) -> class; anything not listed is admitted unconditionally
+ENDPOINT_CLASSES = {
+    ('main.student_form', 'POST'): 'upload',
+    ('main.mock_interview_stream', 'GET'): 'ai',
+    ('main.session_plan_stream', 'GET'): 'ai',
+}
+
+
+class Rejected(Exception):
+    """A request turned away with `status` (429 or 503), to retry after `retry_after`s"""
+
+    def __init__(self, status, retry_after, reason, message):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """At most `limit` requests at once; up to `queue_size` more wait, each for at most `max_wait`s"""
+
+    def __init__(self, limit, queue_size, max_wait):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self.service_time = 1.0  # moving average of seconds held, for Retry-After
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Wait for a slot; raises Rejected if the queue is full or the wait times out"""
+        with self._cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return
+            if self.waiting >= self.queue_size:
+                raise Rejected(503, self.retry_after(), 'queue_full', "Server busy, try again shortly")
+            self.waiting += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self.active < self.limit, self.max_wait)
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                raise Rejected(503, self.retry_after(), 'timeout', "Server busy, try again shortly")
+            self.active += 1
+
+    def release(self, held):
+        with self._cond:
+            self.active -= 1
+            self.service_time = 0.8 * self.service_time + 0.2 * held
+            self._cond.notify()
+
+    def retry_after(self):
+        """Seconds until the current queue has likely drained"""
+        return max(1, math.ceil(self.service_time * (self.waiting + 1) / self.limit))
+
+
+class UserRateLimiter:
+    """Token bucket per user: `per_minute` requests, bursts up to `burst`.
+
+    Buckets for the least recently seen users are dropped past max_users;
+    a dropped user starts again with a full bucket.
+    """
+
+    def __init__(self, per_minute, burst, max_users=10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, user):
+        """0 if the request may go ahead, else seconds until the user's next token"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(user, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[user] = (tokens, now)
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class AdmissionControl:
+    """Concurrency limits, per-user rate limits and backlog checks per endpoint class.
+
+    `limits` maps class -> {concurrency, queue, max_wait, user_rpm, user_burst};
+    classes without user_rpm have no per-user limit.
+    """
+
+    def __init__(self, limits):
+        self.limiters = {}
+        self.rates = {}
+        self.backlogs = {}
+        for name, spec in limits.items():
+            self.limiters[name] = ConcurrencyLimiter(spec['concurrency'], spec['queue'], spec['max_wait'])
+            if spec.get('user_rpm'):
+                self.rates[name] = UserRateLimiter(spec['user_rpm'], spec.get('user_burst', 1))
+
+    def limit_backlog(self, name, depth, max_depth, retry_after=5):
+        """Also turn requests away while depth() >= max_depth (work they'd queue behind)"""
+        self.backlogs[name] = (depth, max_depth, retry_after)
+
+    def admit(self, name, user):
+        """Wait for a slot; raises Rejected when the request should be turned away.
+        `user` None (anonymous) skips the per-user limit."""
+        rate = self.rates.get(name)
+        if rate is not None and user is not None:
+            wait = rate.acquire(user)
+            if wait:
+                raise Rejected(429, math.ceil(wait), 'rate_limited', "Too many requests, slow down")
+        if name in self.backlogs:
+            depth, max_depth, retry_after = self.backlogs[name]
+            if depth() >= max_depth:
+                raise Rejected(503, retry_after, 'backlog', "Server busy, try again shortly")
+        start = time.perf_counter()
+        self.limiters[name].acquire()
+        registry.observe('admission_wait_seconds', time.perf_counter() - start, endpoint_class=name)
+
+    def release(self, name, admitted_at):
+        self.limiters[name].release(time.perf_counter() - admitted_at)
+
+    def threads_held(self):
+        """Most threads the limited classes can occupy at once"""
+        return sum(l.limit + l.queue_size for l in self.limiters.values())
+
+    def stats(self):
+        stats = {}
+        for name, limiter in self.limiters.items():
+            stats[f"{name}_active"] = limiter.active
+            stats[f"{name}_queued"] = limiter.waiting
+        for name, (depth, _, _) in self.backlogs.items():
+            stats[f"{name}_backlog"] = depth()
+        return stats
+
+
+def user_key():
+    """Who a request counts against: the logged-in student or mentor, or
+    None for an anonymous request.
+
+    Never reads the body: touching request.form would parse (and spool) a
+    whole multipart upload before admission had decided to take it.
+    """
+    from flask import session
+    return session.get('email') or session.get('mentor_email')
+
+
+def init_app(app, control):
+    """Gate classified endpoints through `control` before their view runs"""
+    from flask import g, request, jsonify, Response
+
+    # Runs before any view reads the body, so a rejected upload is never parsed
+    @app.before_request
+    def admit():
+        name = ENDPOINT_CLASSES.get((request.endpoint, request.method))
+        if name is None or name not in control.limiters:
+            return None
+        try:
+            control.admit(name, user_key())
+        except Rejected as e:
+            registry.inc('admission_rejected_total', endpoint_class=name, reason=e.reason)
+            if request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'text/html':
+                response = Response(str(e), e.status, mimetype='text/plain')
+            else:
+                response = jsonify({"error": str(e), "retry_after": e.retry_after})
+                response.status_code = e.status
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+        g.admission = (name, time.perf_counter())
+
+    @app.after_request
+    def hand_off(response):
+        # Streamed bodies keep their slot until the last chunk is sent
+        if response.is_streamed and 'admission' in g:
+            admitted = g.pop('admission')
+            response.call_on_close(lambda: control.release(*admitted))
+        return response
+
+    @app.teardown_request
+    def release(exc):
+        admitted = g.pop('admission', None)
+        if admitted:
+            control.release(*admitted)
+
+    registry.gauge('admission', control.stats, "Requests in progress and queued per endpoint class")
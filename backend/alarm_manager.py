@@ -1,5 +1,3 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+from reminders import get_reminder_service
 def start_alarms(email):
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(lambda: print(f"Email {email}: Weekly tasks due!"), 'interval', weeks=1)
-    scheduler.start()
+    get_reminder_service().schedule(email)
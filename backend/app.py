@@ -1,92 +1,173 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from werkzeug.utils import secure_filename
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, session, flash, jsonify, send_file, abort, Response
 import os
+import time
 from datetime import datetime, timedelta
-from apscheduler.schedulers.background import BackgroundScheduler
-from pyresparser import ResumeParser
-import threading
-import qrcode
-from io import BytesIO
-import base64
-import firebase_admin
-from firebase_admin import credentials, firestore
 from functools import wraps
-from flask_mail import Mail, Message
-import stripe
-
-app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY') or os.urandom(24)
-app.config['UPLOAD_FOLDER'] = 'static/resumes'
-app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB limit
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = os.getenv('EMAIL_USER')
-app.config['MAIL_PASSWORD'] = os.getenv('EMAIL_PASS')
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-# Initialize services
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-mail = Mail(app)
-stripe.api_key = os.getenv('STRIPE_KEY')
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
+from reminders import get_reminder_service
+from resume_cache import get_resume_cache, cache_key
+from resume_jobs import parser_version, warm_up as warm_up_resume_parser
+from mentor_summary import record_session_change, get_summary
+from availability import (SlotUnavailable, TooManyRequests, book_session, free_slots,
+                          parse_session_time, record_payment_update, release_session)
+from content_store import etag_for
+from records import student_record, mentor_record, upi_qr_key
+from services import Services
+from session_store import ServerSideSessionInterface
+import metrics
+import admission
+from payments import (get_stripe, get_or_create_checkout, parse_webhook, payment_update_for_event,
+                      checkout_is_paid, expire_checkout)
 
-# --- Helper Functions ---
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'pdf', 'docx', 'doc', 'png', 'jpg', 'jpeg'}
-
-def generate_study_plan(education, goal, skills):
-    plans = {
-        "1st Year": f"Focus on fundamentals: Python, Math. Start exploring {goal}",
-        "2nd Year": f"Build projects using {', '.join(skills)}. Join {goal} communities",
-        "3rd Year": f"Master {goal}-specific tools | LeetCode 3x/week | Mock interviews",
-        "4th Year": "Job prep: Resume polishing, networking, company research",
-        "Final Semester": "Finalize job applications | Practice behavioral interviews"
+bp = Blueprint('main', __name__)
+services = LocalProxy(lambda: current_app.extensions['services'])
+
+
+def create_app(config=None, start_workers=True):
+    """Build the Flask app. Service clients are created on first use.
+
+    Pass start_workers=False when building the app in a pre-fork master
+    (gunicorn preload_app) and call services.start_workers() in each worker.
+    """
+    app = Flask(__name__, template_folder='../template', static_folder='../static')
+    app.secret_key = os.getenv('SECRET_KEY') or os.urandom(24)
+    app.config['UPLOAD_FOLDER'] = 'static/resumes'
+    app.config['QR_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'qr_codes')
+    app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB limit
+    app.config['DATA_BACKEND'] = os.getenv('DATA_BACKEND', 'firestore')  # firestore, memory or sqlite
+    app.config['RESUME_WORKERS'] = int(os.getenv('RESUME_WORKERS', 2))
+    app.config['IO_WORKERS'] = int(os.getenv('IO_WORKERS', 8))
+    # Admission limits per endpoint class (see admission.py), per process.
+    # Queued requests hold a thread too, so keep the total under WEB_THREADS
+    app.config['WEB_THREADS'] = int(os.getenv('WEB_THREADS', 8))
+    app.config['ADMISSION'] = {
+        'upload': {'concurrency': int(os.getenv('UPLOAD_CONCURRENCY', 2)),
+                   'queue': int(os.getenv('UPLOAD_QUEUE', 1)),
+                   'max_wait': float(os.getenv('ADMISSION_MAX_WAIT', 2)),
+                   'user_rpm': float(os.getenv('UPLOAD_USER_RPM', 4)), 'user_burst': 2},
+        'ai': {'concurrency': int(os.getenv('AI_CONCURRENCY', 2)),
+               'queue': int(os.getenv('AI_QUEUE', 1)),
+               'max_wait': float(os.getenv('ADMISSION_MAX_WAIT', 2)),
+               'user_rpm': float(os.getenv('AI_USER_RPM', 6)), 'user_burst': 3},
     }
-    return plans.get(education, f"Custom plan for {goal}")
+    app.config['RESUME_BACKLOG'] = int(os.getenv('RESUME_BACKLOG', 50))  # queued parses before uploads are refused
+    # Reverse proxies in front of the app whose X-Forwarded-For/Proto/Host are
+    # trusted, so request.remote_addr and external URLs (Stripe redirects) are right
+    app.config['TRUSTED_PROXIES'] = int(os.getenv('TRUSTED_PROXIES', 0))
+    app.config['STRIPE_WEBHOOK_SECRET'] = os.getenv('STRIPE_WEBHOOK_SECRET')
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', '1') == '1'
+    app.config['MAIL_USERNAME'] = os.getenv('EMAIL_USER')
+    app.config['MAIL_PASSWORD'] = os.getenv('EMAIL_PASS')
+    app.config.update(config or {})
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    if app.config['TRUSTED_PROXIES']:
+        hops = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
 
-def analyze_resume(filepath):
-    try:
-        data = ResumeParser(filepath).get_extracted_data()
-        return {
-            'skills': data.get('skills', []),
-            'missing_skills': ['Git'] if 'Git' not in data.get('skills', []) else [],
-            'score': min(len(data.get('skills', [])) * 10, 100),
-            'experience': len(data.get('experience', []))
-        }
-    except Exception as e:
-        return {'error': str(e)}
+    metrics.init_app(app)
+    app_services = app.extensions['services'] = Services(app.config)
+    app.session_interface = ServerSideSessionInterface(app_services.session_store)
+    admission_control = admission.AdmissionControl(app.config['ADMISSION'])
+    admission_control.limit_backlog('upload', lambda: app_services.resume_jobs.pending,
+                                    app.config['RESUME_BACKLOG'])
+    admission.init_app(app, admission_control)
+    if admission_control.threads_held() >= app.config['WEB_THREADS']:
+        print(f"Admission limits can hold {admission_control.threads_held()} of "
+              f"{app.config['WEB_THREADS']} threads; cheap routes may starve")
+    metrics.registry.gauge('email_outbox', lambda: app_services.outbox_sender.stats(),
+                           "Outbox delivery counters and queue depth")
+    metrics.registry.gauge('resume_cache', lambda: get_resume_cache().stats(), "Resume analysis cache")
+    metrics.registry.gauge('mentor_cache', lambda: {'hits': app_services.mentor_cache.hits,
+                                                    'misses': app_services.mentor_cache.misses},
+                           "Mentor document cache")
+    app.register_blueprint(bp)
+    if start_workers:
+        app_services.start_workers()
+    return app
+
+
+def warm_up(app):
+    """Load heavy, read-only modules and templates ahead of the first request.
+
+    Only fork-safe work happens here (no network clients or threads), so it
+    can run in a gunicorn master with preload_app and be shared
+    copy-on-write by the workers.
+    """
+    import qrcode  # noqa: F401
+    import mentor_matching  # noqa: F401
+    get_stripe()
+    warm_up_resume_parser()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+# --- Helper Functions ---
+# Small fields kept in the session; everything else is read from the
+# student record by the routes that need it
+SESSION_FIELDS = ('name', 'email', 'education', 'goal', 'skills', 'join_date')
+MAX_FEEDBACK_CHARS = 5000
+
+def experience_level(resume_feedback):
+    if not resume_feedback:
+        return "Beginner"
+    return "Intermediate" if resume_feedback.get('score', 0) < 70 else "Advanced"
+
+def sse_event(data, event=None):
+    """One Server-Sent Events message; each line of data gets its own data: field"""
+    lines = [f"event: {event}"] if event else []
+    lines += [f"data: {line}" for line in data.split('\n')]
+    return "\n".join(lines) + "\n\n"
+
+def sse_response(chunks, on_complete):
+    """Stream text chunks to the browser, then on_complete(full_text) and a done event"""
+    def events():
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event(chunk)
+        except Exception as e:
+            yield sse_event(str(e), 'error')
+            return
+        try:
+            on_complete("".join(parts))
+        except Exception as e:
+            print(f"Saving streamed text failed: {str(e)}")
+        yield sse_event('', 'done')
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+    return response
 
 def start_alarms(email):
-    def send_reminder():
-        print(f"\nALARM: Weekly reminder sent to {email}")
-    
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(send_reminder, 'interval', weeks=1)
-    scheduler.start()
+    get_reminder_service().schedule(email)
 
 def mentor_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'mentor_email' not in session:
-            return redirect(url_for('mentor_register'))
+            return redirect(url_for('main.mentor_register'))
         return f(*args, **kwargs)
     return decorated_function
 
 def send_email(to, subject, body):
+    """Queue an email; the outbox sender delivers it in the background"""
     try:
-        msg = Message(subject, sender=app.config['MAIL_USERNAME'], recipients=[to])
-        msg.body = body
-        mail.send(msg)
+        services.outbox.enqueue(to, subject, body)
         return True
     except Exception as e:
         print(f"Email failed: {str(e)}")
         return False
 
+@bp.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
 # --- Student Routes ---
-@app.route('/', methods=['GET', 'POST'])
+@bp.route('/', methods=['GET', 'POST'])
 def student_form():
     education_options = ["1st Year", "2nd Year", "3rd Year", "4th Year", "Final Semester"]
     interest_options = ["Software Development", "Data Science", "Cybersecurity", "AI/ML", "Design"]
@@ -95,43 +176,44 @@ def student_form():
     if request.method == 'POST':
         try:
             # Handle file upload
-            resume_feedback = None
+            resume_path, resume_hash, resume_feedback = None, None, None
             if 'resume' in request.files:
                 file = request.files['resume']
-                if file.filename != '' and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(filepath)
-                    resume_feedback = analyze_resume(filepath)
+                if file.filename != '':
+                    # save_upload sniffs the bytes and rejects anything but PDF/DOCX
+                    resume_key, resume_hash = services.upload_store.save_upload(file)
+                    resume_path = services.upload_store.path(resume_key)
+                    # Identical resumes reuse the earlier analysis
+                    resume_feedback = get_resume_cache().get(
+                        cache_key(resume_hash, parser_version(request.form.get('interests'))))
+                    if resume_feedback is not None:
+                        services.upload_store.mark_analyzed(resume_path)
 
             # Process form data
-            data = {
-                'name': request.form.get('name'),
-                'email': request.form.get('email'),
-                'degree': request.form.get('degree'),
-                'education': request.form.get('education'),
-                'goal': request.form.get('goal'),
-                'interests': request.form.get('interests'),
-                'skills': request.form.getlist('skills'),
-                'experience': request.form.get('experience'),
-                'resume_feedback': resume_feedback,
-                'study_plan': generate_study_plan(
-                    request.form.get('education'),
-                    request.form.get('goal'),
-                    request.form.getlist('skills')
-                ),
-                'join_date': datetime.now().isoformat()
-            }
-
-            # Store in session and Firebase
-            session.update(data)
-            db.collection('students').document(data['email']).set(data)
+            data = student_record(
+                request.form,
+                resume_feedback=resume_feedback,
+                resume_status='done' if resume_feedback else 'queued' if resume_path else None
+            )
+            if resume_path:
+                # Lets resume_jobs.requeue_stale find the file if this worker restarts
+                data.update(resume_key=resume_key, resume_queued_at=time.time())
+
+            # Store in session and the database
+            session.update({k: data[k] for k in SESSION_FIELDS})
+            services.repos.students.save(data)
+
+            # Analyze resume in the background; dashboard polls resume_status
+            if resume_path and resume_feedback is None:
+                # Scored against the interest area, which names a taxonomy goal
+                session['resume_job_id'] = services.resume_jobs.submit(resume_path, data['email'], resume_hash,
+                                                                       data['interests'])
             
             # Start reminders
-            threading.Thread(target=start_alarms, args=(data['email'],)).start()
+            start_alarms(data['email'])
             
             flash('Registration successful!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         
         except Exception as e:
             flash(f'Registration failed: {str(e)}', 'error')
@@ -142,62 +224,104 @@ def student_form():
                          interest_options=interest_options,
                          skill_options=skill_options)
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     if not session.get('email'):
-        return redirect(url_for('student_form'))
+        return redirect(url_for('main.student_form'))
     
     # Calculate weeks left
     join_date = datetime.fromisoformat(session['join_date'])
     weeks_left = (join_date + timedelta(weeks=16) - datetime.now()).days // 7
     
-    # Get available mentors
-    mentors_ref = db.collection('mentors').where('status', '==', 'active').limit(5)
-    mentors = [doc.to_dict() for doc in mentors_ref.stream()]
+    # Study plan and resume feedback live on the student record, not the session
+    student_future = services.io_pool.submit(services.repos.students.get, session['email'])
+    mentors = services.mentor_cache.active_mentors()
+    student = student_future.result() or {}
+    resume_feedback = student.get('resume_feedback')
     
     return render_template('dashboard.html',
                          name=session['name'],
                          education=session['education'],
                          goal=session['goal'],
                          skills=session['skills'],
-                         study_plan=session['study_plan'],
-                         resume_feedback=session.get('resume_feedback'),
+                         study_plan=student.get('study_plan'),
+                         resume_feedback=resume_feedback,
+                         resume_job_id=session.get('resume_job_id'),
                          weeks_left=max(weeks_left, 0),
-                         level="Beginner" if not session.get('resume_feedback') 
-                              else "Intermediate" if session['resume_feedback']['score'] < 70 
-                              else "Advanced",
+                         level=experience_level(resume_feedback),
                          mentors=mentors)
 
+@bp.route('/resume-status/<job_id>')
+def resume_status(job_id):
+    if not session.get('email'):
+        return jsonify({"error": "Not logged in"}), 401
+
+    job = services.resume_jobs.get(job_id)
+    if job is None:
+        # Finished in another worker process (or before a restart)
+        student = services.repos.students.get(session['email']) or {}
+        job = {'status': student.get('resume_status') or 'unknown',
+               'result': student.get('resume_feedback')}
+    elif job['email'] != session['email']:
+        return jsonify({"error": "Unknown job"}), 404
+
+    if job['status'] in ('done', 'failed'):
+        session.pop('resume_job_id', None)
+        services.resume_jobs.forget(job_id)
+
+    return jsonify({"job_id": job_id, "status": job['status'], "result": job['result']})
+
+@bp.route('/recommend-mentors')
+def recommend_mentors():
+    if not session.get('email'):
+        return jsonify({"error": "Not logged in"}), 401
+
+    k = min(request.args.get('k', 5, type=int), 50)
+    matches = services.mentor_index.match(session.get('skills', []), session.get('goal'), k)
+    return jsonify({"matches": matches})
+
 # --- Mentor Booking System ---
-@app.route('/request-session', methods=['POST'])
+@bp.route('/request-session', methods=['POST'])
 def request_session():
     if not session.get('email'):
         return jsonify({"error": "Not logged in"}), 401
     
     try:
         mentor_email = request.form['mentor_email']
+        mentor = services.mentor_cache.get(mentor_email)
+        if mentor is None:
+            return jsonify({"error": "Unknown mentor"}), 404
+        try:
+            date, duration = parse_session_time(request.form['date'], request.form['duration'])
+        except (KeyError, ValueError) as e:
+            return jsonify({"error": f"Invalid date or duration: {e}"}), 400
         session_data = {
             'student_email': session['email'],
             'student_name': session['name'],
             'mentor_email': mentor_email,
-            'date': request.form['date'],
-            'duration': int(request.form['duration']),
+            'date': date,
+            'duration': duration,
             'topics': request.form['topics'],
             'status': 'pending',
             'created_at': datetime.now().isoformat()
         }
         
-        # Save to Firestore
-        session_ref = db.collection('sessions').document()
-        session_ref.set(session_data)
+        # Save to the database (with the mentor's bookings and dashboard
+        # summary) unless the time is taken or outside their availability
+        session_id = services.repos.sessions.new_id()
+        try:
+            book_session(services.repos, session_id, session_data, mentor)
+        except SlotUnavailable as e:
+            return jsonify({"error": str(e)}), 409
+        except TooManyRequests as e:
+            return jsonify({"error": str(e)}), 429
         
         # Notify mentor
-        mentor = db.collection('mentors').document(mentor_email).get().to_dict()
-        accept_url = f"{request.host_url}accept-session/{session_ref.id}"
+        accept_url = f"{request.host_url}accept-session/{session_id}"
         email_body = f"""
         New session request from {session['name']}:
-        - Date: {request.form['date']}
-        - Duration: {request.form['duration']} minutes
+        - Date: {date}
+        - Duration: {duration} minutes
         - Topics: {request.form['topics']}
         
         Accept: {accept_url}
@@ -208,132 +332,296 @@ def request_session():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/accept-session/<session_id>')
+def search_mentors():
+    """Page of mentors matching the request's filters, and the next-page cursor"""
+    return services.mentor_search.search(
+        skills=request.args.getlist('skill'),
+        role=request.args.get('role'),
+        availability=request.args.getlist('availability'),
+        min_price=request.args.get('min_price', type=float),
+        max_price=request.args.get('max_price', type=float),
+        cursor=request.args.get('cursor'),
+        limit=request.args.get('limit', 20, type=int))
+
+@bp.route('/mentors/search')
+def mentor_search():
+    try:
+        mentors, next_cursor = search_mentors()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"mentors": mentors, "next_cursor": next_cursor})
+
+@bp.route('/browse-mentors')
+def browse_mentors():
+    try:
+        mentors, next_cursor = search_mentors()
+    except ValueError:
+        return redirect(url_for('main.browse_mentors'))
+    next_args = request.args.to_dict(flat=False)
+    next_args['cursor'] = next_cursor
+    return render_template('browsw_mentors.html', mentors=mentors, next_cursor=next_cursor,
+                           next_args=next_args, filters=request.args)
+
+@bp.route('/mentors/<mentor_email>/slots')
+def mentor_slots(mentor_email):
+    """Free slots in an ISO week (?week=2031-W01, default this week)"""
+    mentor = services.mentor_cache.get(mentor_email)
+    if mentor is None:
+        return jsonify({"error": "Unknown mentor"}), 404
+    try:
+        week = request.args.get('week')
+        if week:
+            week_start = datetime.strptime(week + '-1', '%G-W%V-%u')
+        else:
+            today = datetime.combine(datetime.now().date(), datetime.min.time())
+            week_start = today - timedelta(days=today.weekday())
+        minutes = request.args.get('duration', 60, type=int)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"week_start": week_start.date().isoformat(),
+                    "slots": free_slots(services.repos, mentor, week_start, minutes)})
+
+@bp.route('/accept-session/<session_id>')
 @mentor_required
 def accept_session(session_id):
     try:
-        session_ref = db.collection('sessions').document(session_id)
-        session_data = session_ref.get().to_dict()
+        # One batched read; the mentor is read fresh, not from the cache,
+        # because the checkout price comes from their current hourly_charge
+        repos = services.repos
+        session_data, mentor = repos.get_all([(repos.sessions, session_id),
+                                              (repos.mentors, session['mentor_email'])])
         
-        if session_data['mentor_email'] != session['mentor_email']:
+        if not session_data or session_data['mentor_email'] != session['mentor_email']:
             flash("Unauthorized action", "error")
-            return redirect(url_for('mentor_dashboard'))
-        
-        # Create Stripe payment session
-        mentor = db.collection('mentors').document(session['mentor_email']).get().to_dict()
-        amount = int(mentor['hourly_charge'] * (session_data['duration'] / 60) * 100
+            return redirect(url_for('main.mentor_dashboard'))
+        if session_data['status'] not in ('pending', 'accepted'):
+            flash(f"This request was {session_data['status']}", "warning")
+            return redirect(url_for('main.mentor_dashboard'))
         
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price_data': {
-                    'currency': 'usd',
-                    'product_data': {
-                        'name': f"Mentorship Session with {mentor['name']}",
-                    },
-                    'unit_amount': amount,
-                },
-                'quantity': 1,
-            }],
-            mode='payment',
-            success_url=url_for('payment_success', session_id=session_id, _external=True),
-            cancel_url=url_for('payment_cancel', _external=True),
-            metadata={
-                "session_id": session_id,
-                "mentor_email": session['mentor_email'],
-                "student_email": session_data['student_email']
-            }
+        # Create Stripe payment session (reused if this session already has one)
+        checkout = get_or_create_checkout(
+            session_id, session_data, mentor,
+            success_url=url_for('main.payment_success', session_id=session_id, _external=True),
+            cancel_url=url_for('main.payment_cancel', _external=True)
         )
         
-        # Update session status
-        session_ref.update({
-            'status': 'accepted',
-            'payment_link': checkout_session.url,
-            'payment_id': checkout_session.id,
-            'amount': amount / 100
-        })
-        
-        # Notify student
-        student = db.collection('students').document(session_data['student_email']).get().to_dict()
-        email_body = f"""
-        Your session request with {mentor['name']} has been accepted!
-        Payment required: {checkout_session.url}
-        """
-        send_email(student['email'], "Session Accepted", email_body)
+        if checkout['created']:
+            # Declined or expired while the checkout was being created: the
+            # time may be booked by someone else now, so withdraw the checkout
+            accepted = record_session_change(repos, session_id, {
+                'status': 'accepted',
+                'payment_link': checkout['url'],
+                'payment_id': checkout['id'],
+                'payment_status': 'pending',
+                'amount': checkout['amount']
+            }, from_status=('pending', 'accepted'))
+            if accepted is None:
+                try:
+                    expire_checkout(checkout['id'])
+                except Exception as e:
+                    print(f"Could not expire checkout {checkout['id']}: {str(e)}")
+                flash("This request was withdrawn before it could be accepted", "warning")
+                return redirect(url_for('main.mentor_dashboard'))
+            email_body = f"""
+            Your session request with {mentor['name']} has been accepted!
+            Payment required: {checkout['url']}
+            """
+            send_email(session_data['student_email'], "Session Accepted", email_body)
         
-        return redirect(checkout_session.url)
+        return redirect(checkout['url'])
     except Exception as e:
         flash(f"Error: {str(e)}", "error")
-        return redirect(url_for('mentor_dashboard'))
+        return redirect(url_for('main.mentor_dashboard'))
 
-@app.route('/payment-success/<session_id>')
+@bp.route('/decline-session/<session_id>')
+@mentor_required
+def decline_session(session_id):
+    try:
+        session_data = services.repos.sessions.get(session_id)
+        if not session_data or session_data['mentor_email'] != session['mentor_email']:
+            flash("Unauthorized action", "error")
+            return redirect(url_for('main.mentor_dashboard'))
+
+        # Frees the requested time for other students
+        if release_session(services.repos, session_id, {'status': 'declined'}):
+            mentor = services.mentor_cache.get(session['mentor_email'])
+            email_body = f"""
+            {mentor['name']} can't take your session request for {session_data['date']}.
+            Please pick another time or mentor.
+            """
+            send_email(session_data['student_email'], "Session Request Declined", email_body)
+            flash("Request declined", "success")
+        else:
+            flash(f"This request was already {session_data['status']}", "warning")
+    except Exception as e:
+        flash(f"Error: {str(e)}", "error")
+    return redirect(url_for('main.mentor_dashboard'))
+
+@bp.route('/payment-success/<session_id>')
 def payment_success(session_id):
-    session_ref = db.collection('sessions').document(session_id)
-    session_data = session_ref.get().to_dict()
+    session_data = services.repos.sessions.get(session_id)
     
     if not session_data:
         flash("Invalid session", "error")
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
-    # Update payment status
-    session_ref.update({'payment_status': 'completed'})
+    # Payment state is recorded by the Stripe webhook; if the redirect got
+    # here first, confirm with Stripe instead of trusting the redirect
+    if session_data.get('payment_status') != 'completed':
+        try:
+            paid = bool(session_data.get('payment_id')) and checkout_is_paid(session_data['payment_id'])
+        except Exception as e:
+            print(f"Payment check failed for {session_id}: {str(e)}")
+            paid = False
+        if paid:
+            record_session_change(services.repos, session_id, {'payment_status': 'completed'})
+        else:
+            flash("We're still confirming your payment.", "warning")
     
     # Get meeting details
-    mentor = db.collection('mentors').document(session_data['mentor_email']).get().to_dict()
+    mentor = services.mentor_cache.get(session_data['mentor_email'])
     
     return render_template('payment_success.html',
                          mentor_name=mentor['name'],
                          zoom_link=mentor.get('zoom_link', '#'),
                          session_date=session_data['date'])
 
-@app.route('/payment-cancel')
+@bp.route('/stripe-webhook', methods=['POST'])
+def stripe_webhook():
+    try:
+        event = parse_webhook(request.get_data(), request.headers.get('Stripe-Signature'),
+                              current_app.config['STRIPE_WEBHOOK_SECRET'])
+        update = payment_update_for_event(event)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if update:
+        try:
+            record_payment_update(services.repos, *update)
+        except KeyError:
+            # Not one of our sessions; retrying the event won't change that
+            print(f"Webhook {event['id']} for unknown session {update[0]}")
+    return jsonify({"received": True})
+
+@bp.route('/payment-cancel')
 def payment_cancel():
     flash("Payment was cancelled", "warning")
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
+
+# --- AI Streaming ---
+@bp.route('/mock-interview')
+def mock_interview():
+    if not session.get('email'):
+        return redirect(url_for('main.student_form'))
+
+    role = request.args.get('role') or session.get('goal')
+    student = services.repos.students.get(session['email']) or {}
+    # Questions already generated for this role are shown without streaming
+    questions = student.get('interview_questions') if student.get('interview_role') == role else None
+    return render_template('mock_interview.html', role=role, questions=questions)
+
+@bp.route('/mock-interview/stream')
+def mock_interview_stream():
+    if not session.get('email'):
+        return jsonify({"error": "Not logged in"}), 401
+
+    import gemini_helper
+    role = request.args.get('role') or session.get('goal')
+    email = session['email']
+    students = services.repos.students
+    level = experience_level((students.get(email) or {}).get('resume_feedback'))
+
+    def save(text):
+        students.update(email, {'interview_questions': text, 'interview_role': role})
+
+    return sse_response(gemini_helper.stream_interview_questions(role, level), save)
+
+def session_for_party(session_id):
+    """Session doc if the logged-in student or mentor is part of it, else None"""
+    session_data = services.repos.sessions.get(session_id)
+    if not session_data:
+        return None
+    if session_data['student_email'] == session.get('email') or \
+            session_data['mentor_email'] == session.get('mentor_email'):
+        return session_data
+    return None
+
+def feedback_open(session_data):
+    """Whether the student can leave feedback: the session was accepted and has started"""
+    return session_data.get('status') in ('accepted', 'completed') and \
+        session_data['date'] <= datetime.now().isoformat()
+
+@bp.route('/session-plan/<session_id>')
+def session_plan(session_id):
+    session_data = session_for_party(session_id)
+    if session_data is None:
+        abort(404)
+    return render_template('session_plan.html', session_id=session_id,
+                           session_data=session_data, plan=session_data.get('session_plan'),
+                           can_leave_feedback=session_data['student_email'] == session.get('email')
+                           and feedback_open(session_data))
+
+@bp.route('/session-plan/<session_id>/stream')
+def session_plan_stream(session_id):
+    session_data = session_for_party(session_id)
+    if session_data is None:
+        return jsonify({"error": "Unknown session"}), 404
+
+    import gemini_helper
+    mentor = services.mentor_cache.get(session_data['mentor_email']) or {}
+    expertise = f"{mentor.get('current_role', '')} ({', '.join(mentor.get('skills', []))})"
+    repos = services.repos
+
+    def save(text):
+        record_session_change(repos, session_id, {'session_plan': text})
+
+    return sse_response(gemini_helper.stream_session_plan(expertise, session_data['topics']), save)
+
+@bp.route('/session-feedback/<session_id>', methods=['POST'])
+def session_feedback(session_id):
+    """Student feedback on a session; feedback_analytics.py rolls it up per mentor"""
+    session_data = session_for_party(session_id)
+    if session_data is None or session_data['student_email'] != session.get('email'):
+        abort(404)
+    feedback = request.form.get('feedback', '').strip()[:MAX_FEEDBACK_CHARS]
+    if not feedback_open(session_data):
+        flash("Feedback opens once the session has taken place", "warning")
+    elif feedback:
+        record_session_change(services.repos, session_id, {
+            'feedback': feedback,
+            'feedback_at': datetime.now().isoformat(),
+            'status': 'completed'
+        })
+        flash("Thanks for your feedback!", "success")
+    return redirect(url_for('main.session_plan', session_id=session_id))
 
 # --- Mentor Routes ---
-@app.route('/mentor-register', methods=['GET', 'POST'])
+@bp.route('/mentor-register', methods=['GET', 'POST'])
 def mentor_register():
     if request.method == 'POST':
         try:
-            # Handle QR code upload
+            # Handle QR code upload (stored once by content hash)
             qr_img = None
             if 'qr_code' in request.files:
                 file = request.files['qr_code']
-                if file.filename != '' and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    qr_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'qr_codes')
-                    os.makedirs(qr_dir, exist_ok=True)
-                    filepath = os.path.join(qr_dir, filename)
-                    file.save(filepath)
-                    qr_img = f"qr_codes/{filename}"
+                if file.filename != '':
+                    # Type and extension come from the image bytes, not the file name
+                    qr_img, _ = services.qr_store.save_upload(file, allowed=('png', 'jpg'))
 
             # Generate QR if UPI ID provided
             if not qr_img and request.form.get('upi_id'):
-                img = qrcode.make(f"upi://pay?pa={request.form['upi_id']}")
-                buffered = BytesIO()
-                img.save(buffered, format="PNG")
-                qr_img = base64.b64encode(buffered.getvalue()).decode()
-
-            mentor_data = {
-                'name': request.form['name'],
-                'email': request.form['email'],
-                'current_role': request.form['current_role'],
-                'availability': request.form.getlist('availability'),
-                'hourly_charge': float(request.form['hourly_charge']),
-                'notification_method': request.form['notification_method'],
-                'zoom_link': request.form.get('zoom_link', ''),
-                'payment_qr': qr_img,
-                'registration_date': datetime.now().isoformat(),
-                'status': 'active',
-                'skills': request.form.getlist('skills')
-            }
-
-            db.collection('mentors').document(mentor_data['email']).set(mentor_data)
+                qr_img = upi_qr_key(services.qr_store, request.form['upi_id'])
+
+            mentor_data = mentor_record(request.form, payment_qr=qr_img)
+
+            services.repos.mentors.save(mentor_data)
+            services.mentor_index.upsert(mentor_data)
+            services.mentor_search.upsert(mentor_data)
+            services.mentor_cache.put(mentor_data)
             session['mentor_email'] = mentor_data['email']
             
             flash('Registration successful!', 'success')
-            return redirect(url_for('mentor_dashboard'))
+            return redirect(url_for('main.mentor_dashboard'))
         
         except Exception as e:
             flash(f'Registration failed: {str(e)}', 'error')
@@ -341,164 +629,43 @@ def mentor_register():
     
     return render_template('mentor_form.html')
 
-@app.route('/mentor-dashboard')
+@bp.route('/qr/<path:key>')
+def qr_image(key):
+    try:
+        path = services.qr_store.path(key)
+    except ValueError:
+        abort(404)
+    if not os.path.exists(path):
+        abort(404)
+    # Keys are content hashes, so the file behind a URL never changes
+    response = send_file(path, max_age=31536000, etag=etag_for(key), conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/mentor-dashboard')
 @mentor_required
 def mentor_dashboard():
     try:
-        mentor_doc = db.collection('mentors').document(session['mentor_email']).get()
-        if not mentor_doc.exists:
+        mentor = services.mentor_cache.get(session['mentor_email'])
+        if mentor is None:
             session.pop('mentor_email', None)
-            return redirect(url_for('mentor_register'))
-        
-        # Get pending and upcoming sessions
-        now = datetime.now().isoformat()
-        pending_sessions = db.collection('sessions')\
-                           .where('mentor_email', '==', session['mentor_email'])\
-                           .where('status', '==', 'pending')\
-                           .order_by('created_at')\
-                           .stream()
+            return redirect(url_for('main.mentor_register'))
         
-        upcoming_sessions = db.collection('sessions')\
-                            .where('mentor_email', '==', session['mentor_email'])\
-                            .where('status', 'in', ['accepted', 'completed'])\
-                            .where('date', '>=', now)\
-                            .order_by('date')\
-                            .limit(5)\
-                            .stream()
+        # Pending and upcoming sessions come precomputed in the mentor's summary
+        summary = get_summary(services.repos, session['mentor_email'])
+        # Rolled up from session feedback by feedback_analytics.py
+        insights = services.repos.mentor_insights.get(session['mentor_email'])
         
         return render_template('mentor_dashboard.html', 
-                            mentor=mentor_doc.to_dict(),
-                            pending_sessions=[s.to_dict() for s in pending_sessions],
-                            upcoming_sessions=[s.to_dict() for s in upcoming_sessions])
+                            mentor=mentor,
+                            summary=summary,
+                            insights=insights,
+                            pending_sessions=summary['pending'],
+                            upcoming_sessions=summary['upcoming'])
     except Exception as e:
         flash(f'Error loading dashboard: {str(e)}', 'error')
-        return redirect(url_for('mentor_register'))
-@app.route('/accept-session/<session_id>')
-@mentor_required
-def accept_session(session_id):
-    try:
-        session_ref = db.collection('sessions').document(session_id)
-        session_data = session_ref.get().to_dict()
-        
-        # Verify mentor owns this session
-        if session_data['mentor_email'] != session['mentor_email']:
-            flash("Unauthorized action", "error")
-            return redirect(url_for('mentor_dashboard'))
-        
-        # Create Stripe payment link
-        mentor = db.collection('mentors').document(session['mentor_email']).get().to_dict()
-        amount = int(mentor['hourly_charge'] * (session_data['duration'] / 60) * 100)
-        
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price_data': {
-                    'currency': 'usd',
-                    'product_data': {'name': f"Session with {mentor['name']}"},
-                    'unit_amount': amount,
-                },
-                'quantity': 1,
-            }],
-            mode='payment',
-            success_url=url_for('payment_success', session_id=session_id, _external=True),
-            cancel_url=url_for('payment_cancel', _external=True),
-        )
-        
-        # Update session status
-        session_ref.update({
-            'status': 'accepted',
-            'payment_link': checkout_session.url,
-            'payment_id': checkout_session.id
-        })
-        
-        # Notify student
-        student = db.collection('students').document(session_data['student_email']).get().to_dict()
-        send_email(
-            student['email'],
-            "Session Accepted!",
-            f"Your mentor has accepted the session. Pay now: {checkout_session.url}"
-        )
-        
-        return redirect(checkout_session.url)
-    except Exception as e:
-        flash(f"Error: {str(e)}", "error")
- 
-        return redirect(url_for('mentor_dashboard'))
-# ... [all your existing imports and configurations stay at the top] ...
-
-# ... [keep all existing routes before this point] ...
-
-# ===== ADD THE NEW ROUTE HERE =====
-# AFTER your existing mentor routes but BEFORE these final lines:
-
-# --- Mentor Booking System ---
-@app.route('/request-session', methods=['POST'])
-def request_session():
-    # ... [your existing request-session route] ...
+        return redirect(url_for('main.mentor_register'))
 
-# ADD THE ACCEPT-SESSION ROUTE RIGHT HERE
-@app.route('/accept-session/<session_id>')
-@mentor_required
-def accept_session(session_id):
-    try:
-        session_ref = db.collection('sessions').document(session_id)
-        session_data = session_ref.get().to_dict()
-        
-        # Verify mentor owns this session
-        if session_data['mentor_email'] != session['mentor_email']:
-            flash("Unauthorized action", "error")
-            return redirect(url_for('mentor_dashboard'))
-        
-        # Create Stripe payment link
-        mentor = db.collection('mentors').document(session['mentor_email']).get().to_dict()
-        amount = int(mentor['hourly_charge'] * (session_data['duration'] / 60) * 100
-        
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price_data': {
-                    'currency': 'usd',
-                    'product_data': {'name': f"Session with {mentor['name']}"},
-                    'unit_amount': amount,
-                },
-                'quantity': 1,
-            }],
-            mode='payment',
-            success_url=url_for('payment_success', session_id=session_id, _external=True),
-            cancel_url=url_for('payment_cancel', _external=True),
-        )
-        
-        # Update session status
-        session_ref.update({
-            'status': 'accepted',
-            'payment_link': checkout_session.url,
-            'payment_id': checkout_session.id
-        })
-        
-        # Notify student
-        student = db.collection('students').document(session_data['student_email']).get().to_dict()
-        send_email(
-            student['email'],
-            "Session Accepted!",
-            f"Your mentor has accepted the session. Pay now: {checkout_session.url}"
-        )
-        
-        return redirect(checkout_session.url)
-    except Exception as e:
-        flash(f"Error: {str(e)}", "error")
-        return redirect(url_for('mentor_dashboard'))
-
-# --- Payment Handlers (add these next) ---
-@app.route('/payment-success/<session_id>')
-def payment_success(session_id):
-    # ... [payment success handler] ...
-
-@app.route('/payment-cancel')
-def payment_cancel():
-    # ... [payment cancel handler] ...
-
-# ==== KEEP THIS AT THE VERY BOTTOM ====
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)        
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
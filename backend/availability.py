@@ -0,0 +1,291 @@
+"""Mentor availability slots and conflict-free booking.
+
+A mentor's `availability` codes expand into weekly time windows. Booked
+sessions are kept per mentor in a `mentor_bookings` document as sorted,
+non-overlapping intervals, so conflict checks and free-slot lookups are a
+binary search. book_session() checks and records the booking in the same
+transaction as the session and mentor summary writes, so two requests for
+the same time can't both succeed. A pending request holds its time until
+the mentor declines it or it expires unanswered (release_session).
+"""
+import os
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from mentor_summary import apply_session, empty_summary, record_session_change
+
+SLOT_MINUTES = 30
+MAX_DURATION = 240
+# Unanswered requests stop holding the mentor's time after this long
+PENDING_EXPIRY_HOURS = float(os.getenv('PENDING_EXPIRY_HOURS', 48))
+# Pending requests a student may have open at once
+MAX_OPEN_REQUESTS = int(os.getenv('MAX_OPEN_REQUESTS', 3))
+DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# availability code -> (weekdays, start hour, end hour)
+AVAILABILITY_WINDOWS = {
+    'weekday_mornings': (range(0, 5), 8, 12),
+    'weekday_afternoons': (range(0, 5), 12, 17),
+    'weekday_evenings': (range(0, 5), 17, 21),
+    'weekend_mornings': (range(5, 7), 8, 12),
+    'weekend_afternoons': (range(5, 7), 12, 17),
+}
+# A bare day name means office hours that day
+AVAILABILITY_WINDOWS.update({day: ((i,), 9, 17) for i, day in enumerate(DAYS)})
+
+
+class SlotUnavailable(Exception):
+    """The requested time is outside the mentor's availability or already booked"""
+
+
+class TooManyRequests(Exception):
+    """The student already has MAX_OPEN_REQUESTS pending requests"""
+
+
+def _minute(value):
+    return value.isoformat(timespec='minutes')
+
+
+def parse_session_time(date, duration):
+    """(ISO start in server-local time, minutes) from request values; ValueError if invalid.
+
+    Times with a UTC offset are converted to local time, since availability
+    windows and stored session dates are naive local times.
+    """
+    start = datetime.fromisoformat(date)
+    if start.tzinfo is not None:
+        start = start.astimezone().replace(tzinfo=None)
+    duration = int(duration)
+    if not 0 < duration <= MAX_DURATION:
+        raise ValueError(f"Duration must be between 1 and {MAX_DURATION} minutes")
+    return _minute(start), duration
+
+
+def session_interval(session_data):
+    """(start, end) datetimes of a session from its date and duration"""
+    start = datetime.fromisoformat(session_data['date'])
+    return start, start + timedelta(minutes=int(session_data['duration']))
+
+
+def windows_for_day(availability, day):
+    """Sorted, merged (start, end) windows on a date from availability codes"""
+    windows = []
+    for code in availability or ():
+        spec = AVAILABILITY_WINDOWS.get(code)
+        if spec and day.weekday() in spec[0]:
+            base = datetime(day.year, day.month, day.day)
+            windows.append((base + timedelta(hours=spec[1]), base + timedelta(hours=spec[2])))
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def week_windows(availability, week_start):
+    """Availability windows for the 7 days from week_start"""
+    windows = []
+    for offset in range(7):
+        windows.extend(windows_for_day(availability, week_start + timedelta(days=offset)))
+    return windows
+
+
+def within_availability(availability, start, end):
+    """Whether [start, end) fits in one window; mentors with no known codes accept any time"""
+    if not any(code in AVAILABILITY_WINDOWS for code in availability or ()):
+        return True
+    return any(ws <= start and end <= we for ws, we in windows_for_day(availability, start))
+
+
+class BookingIndex:
+    """One mentor's booked intervals, sorted by start and non-overlapping.
+
+    Because intervals never overlap, ends are sorted too, so every lookup
+    is a bisect over `starts` or `ends`.
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        for start, end, session_id in intervals:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.ids.append(session_id)
+
+    @classmethod
+    def from_doc(cls, doc):
+        return cls((datetime.fromisoformat(s), datetime.fromisoformat(e), i)
+                   for s, e, i in (doc or {}).get('intervals', []))
+
+    def to_doc(self):
+        return {'intervals': [[_minute(s), _minute(e), i]
+                              for s, e, i in zip(self.starts, self.ends, self.ids)]}
+
+    def conflict(self, start, end):
+        """Session id of a booking overlapping [start, end), or None"""
+        i = bisect_left(self.starts, end)
+        if i > 0 and self.ends[i - 1] > start:
+            return self.ids[i - 1]
+        return None
+
+    def add(self, start, end, session_id):
+        if self.conflict(start, end) is not None:
+            raise SlotUnavailable("That time is already booked")
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, session_id)
+
+    def remove(self, session_id):
+        if session_id in self.ids:
+            i = self.ids.index(session_id)
+            del self.starts[i], self.ends[i], self.ids[i]
+
+    def prune(self, before):
+        """Drop bookings that ended by `before`"""
+        i = bisect_right(self.ends, before)
+        del self.starts[:i], self.ends[:i], self.ids[:i]
+
+    def free_slots(self, windows, minutes=60, step=SLOT_MINUTES):
+        """(start, end) slots of `minutes` on a `step` grid inside windows, skipping bookings"""
+        length = timedelta(minutes=minutes)
+        step = timedelta(minutes=step)
+        slots = []
+        for ws, we in windows:
+            j = bisect_right(self.ends, ws)
+            t = ws
+            while t + length <= we:
+                while j < len(self.ends) and self.ends[j] <= t:
+                    j += 1
+                if j < len(self.starts) and self.starts[j] < t + length:
+                    # Jump to the first grid point at or after this booking ends
+                    t = ws + -(-(self.ends[j] - ws) // step) * step
+                    continue
+                slots.append((t, t + length))
+                t += step
+        return slots
+
+
+def free_slots(repos, mentor, week_start, minutes=60, now=None):
+    """Free slots for a mentor in the week starting week_start, as ISO strings"""
+    now = now or datetime.now()
+    index = BookingIndex.from_doc(repos.mentor_bookings.get(mentor['email']))
+    slots = index.free_slots(week_windows(mentor.get('availability'), week_start), minutes)
+    return [{'start': _minute(s), 'end': _minute(e)} for s, e in slots if s >= now]
+
+
+def open_requests(repos, student_email):
+    return len(repos.sessions.query([('student_email', '==', student_email), ('status', '==', 'pending')]))
+
+
+def book_session(repos, session_id, session_data, mentor, now=None):
+    """Create a session if its time is free, in one transaction with the
+    mentor's bookings and summary; raises SlotUnavailable otherwise, or
+    TooManyRequests if the student has too many requests open"""
+    now = now or datetime.now()
+    start, end = session_interval(session_data)
+    if start < now:
+        raise SlotUnavailable("That time has already passed")
+    if not within_availability(mentor.get('availability'), start, end):
+        raise SlotUnavailable("That time is outside the mentor's availability")
+    if open_requests(repos, session_data['student_email']) >= MAX_OPEN_REQUESTS:
+        raise TooManyRequests(f"You already have {MAX_OPEN_REQUESTS} requests awaiting an answer")
+    mentor_email = session_data['mentor_email']
+
+    def update(docs):
+        old, summary, bookings = docs
+        if old is not None:
+            raise SlotUnavailable(f"sessions/{session_id} already exists")
+        index = BookingIndex.from_doc(bookings)
+        index.prune(now)
+        index.add(start, end, session_id)
+        summary = apply_session(summary or empty_summary(mentor_email), session_id, None, session_data)
+        return [dict(session_data), summary, index.to_doc()]
+
+    new, _, _ = repos.transact([(repos.sessions, session_id),
+                                (repos.mentor_summaries, mentor_email),
+                                (repos.mentor_bookings, mentor_email)], update)
+    return new
+
+
+def release_session(repos, session_id, changes, from_status='pending'):
+    """Apply `changes` (e.g. status 'declined') to a session still in
+    from_status and free its booked time, in one transaction with the
+    mentor's summary. Returns the updated session, or None if it had
+    already moved on (accepted, or released by another worker)."""
+    existing = repos.sessions.get(session_id)
+    if existing is None:
+        raise KeyError(f"sessions/{session_id} does not exist")
+    mentor_email = existing['mentor_email']
+
+    def update(docs):
+        old, summary, bookings = docs
+        if old is None or old.get('status') != from_status:
+            return [None, None, None]
+        new = dict(old, **changes)
+        summary = apply_session(summary or empty_summary(mentor_email), session_id, old, new)
+        index = BookingIndex.from_doc(bookings)
+        index.remove(session_id)
+        return [new, summary, index.to_doc()]
+
+    new, _, _ = repos.transact([(repos.sessions, session_id),
+                                (repos.mentor_summaries, mentor_email),
+                                (repos.mentor_bookings, mentor_email)], update)
+    return new
+
+
+def record_payment_update(repos, session_id, changes):
+    """Record a Stripe checkout event's payment fields on a session.
+
+    A checkout that expired unpaid ends an accepted session: it is marked
+    'expired' and its booked time freed, as a declined request's would be.
+    """
+    if changes.get('payment_status') == 'expired':
+        released = release_session(repos, session_id, dict(changes, status='expired'),
+                                   from_status='accepted')
+        if released is not None:
+            return released
+    return record_session_change(repos, session_id, changes)
+
+
+def expire_pending(repos, now=None, max_age_hours=PENDING_EXPIRY_HOURS):
+    """Mark requests left pending longer than max_age_hours 'expired' and free their time"""
+    now = now or datetime.now()
+    cutoff = (now - timedelta(hours=max_age_hours)).isoformat()
+    expired = 0
+    for session_id, _ in repos.sessions.query_items([('status', '==', 'pending'), ('created_at', '<', cutoff)]):
+        if release_session(repos, session_id, {'status': 'expired'}):
+            expired += 1
+    return expired
+
+
+class PendingExpiry:
+    """Runs expire_pending on a background scheduler job"""
+
+    def __init__(self, repos, interval_minutes=15):
+        self.repos = repos
+        self.interval_minutes = interval_minutes
+        self.expired = 0
+        self._scheduler = None
+
+    def run(self):
+        try:
+            self.expired += expire_pending(self.repos)
+        except Exception as e:
+            print(f"Pending request expiry failed: {str(e)}")
+
+    def start(self):
+        if self._scheduler is None:
+            from apscheduler.schedulers.background import BackgroundScheduler
+            self._scheduler = BackgroundScheduler()
+            self._scheduler.add_job(self.run, 'interval', minutes=self.interval_minutes,
+                                    id='expire_pending', max_instances=1, coalesce=True)
+            self._scheduler.start()
+        return self
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
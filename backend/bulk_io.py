@@ -0,0 +1,202 @@
+"""Bulk import of students/mentors and streaming export of any collection.
+
+Rows from CSV or JSONL go through the same normalization as the
+registration routes (records.py), are written in batched commits with a
+bounded number in flight, and progress is checkpointed so an interrupted
+import picks up where it stopped. Memory stays flat: the input is read one
+row at a time and at most `concurrency` batches are held.
+
+    python bulk_io.py import students cohort.csv
+    python bulk_io.py import mentors mentors.jsonl --batch-size 500 --concurrency 8
+    python bulk_io.py export sessions sessions.jsonl
+
+List fields (skills, availability) are ';'-separated in CSV. Imports are
+idempotent (documents are keyed by email), so re-running is safe. Each
+mentor batch moves the mentors' version stamp, and running app processes
+reload their matching/search indexes within MENTOR_INDEX_RELOAD seconds.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+BATCH_SIZE = 500
+CONCURRENCY = 4
+
+
+def read_rows(path, fmt=None):
+    """Yield (line_number, row dict) from a CSV or JSONL file"""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            for n, row in enumerate(csv.DictReader(f), 1):
+                yield n, row
+        else:
+            for n, line in enumerate(f, 1):
+                if line.strip():
+                    yield n, json.loads(line)
+
+
+class Checkpoint:
+    """Highest row number below which every batch has committed.
+
+    Batches finish out of order, so the mark only advances over a
+    contiguous run of finished batches.
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.line = 0
+        self._pending = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get('source') == self.source:
+                self.line = saved['line']
+
+    def finished(self, first_line, last_line):
+        self._pending[first_line] = last_line
+        advanced = False
+        while self.line + 1 in self._pending:
+            self.line = self._pending.pop(self.line + 1)
+            advanced = True
+        if advanced and self.path:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'source': self.source, 'line': self.line}, f)
+            os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def build_documents(kind, rows, errors, qr_store=None):
+    """[(doc_id, data)] for a chunk of rows; rejected rows go to `errors`"""
+    from records import student_record, mentor_record, upi_qr_key
+    docs = []
+    for n, row in rows:
+        try:
+            if kind == 'students':
+                data = student_record(row)
+            else:
+                qr = row.get('payment_qr') or None
+                if not qr and row.get('upi_id') and qr_store is not None:
+                    qr = upi_qr_key(qr_store, row['upi_id'])
+                data = mentor_record(row, payment_qr=qr)
+            docs.append((data['email'], data))
+        except (KeyError, ValueError, TypeError) as e:
+            errors.write(json.dumps({'line': n, 'error': f"{type(e).__name__}: {e}", 'row': row}) + "\n")
+    return docs
+
+
+def import_file(repos, kind, path, fmt=None, batch_size=BATCH_SIZE, concurrency=CONCURRENCY,
+                checkpoint_path=None, errors_path=None, qr_store=None):
+    repo = getattr(repos, kind)
+    checkpoint = Checkpoint(checkpoint_path, path)
+    rows = ((n, row) for n, row in read_rows(path, fmt) if n > checkpoint.line)
+    errors_path = errors_path or os.devnull
+    errors = open(errors_path, 'a')
+    written = skipped = 0
+    covered = checkpoint.line
+    start = time.perf_counter()
+
+    def commit(docs):
+        with repos.batch() as batch:
+            for doc_id, data in docs:
+                batch.set(repo, doc_id, data)
+        return len(docs)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = {}
+            while True:
+                chunk = list(islice(rows, batch_size))
+                if chunk:
+                    docs = build_documents(kind, chunk, errors, qr_store)
+                    skipped += len(chunk) - len(docs)
+                    # A batch accounts for every row number since the previous one
+                    in_flight[pool.submit(commit, docs)] = (covered + 1, chunk[-1][0])
+                    covered = chunk[-1][0]
+                # Keep at most `concurrency` batches in memory
+                while in_flight and (len(in_flight) >= concurrency or not chunk):
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        first, last = in_flight.pop(future)
+                        written += future.result()
+                        checkpoint.finished(first, last)
+                    elapsed = time.perf_counter() - start
+                    print(f"\r{written} written, {skipped} rejected, line {checkpoint.line} "
+                          f"({written / max(elapsed, 1e-9):.0f}/s)", end='', flush=True)
+                if not chunk:
+                    break
+    finally:
+        errors.close()
+        if errors_path != os.devnull and os.path.getsize(errors_path) == 0:
+            os.remove(errors_path)
+        print()
+    checkpoint.clear()
+    return written, skipped
+
+
+def export_collection(backend, collection, path, page_size=BATCH_SIZE):
+    """Write every document as {"id", "data"} lines, one page in memory at a time"""
+    count = 0
+    out = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+    try:
+        for doc_id, data in backend.stream(collection, page_size):
+            out.write(json.dumps({'id': doc_id, 'data': data}, default=str) + "\n")
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help="import students or mentors from CSV/JSONL")
+    imp.add_argument('kind', choices=['students', 'mentors'])
+    imp.add_argument('path')
+    imp.add_argument('--format', choices=['csv', 'jsonl'], help="default: from the file extension")
+    imp.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    imp.add_argument('--concurrency', type=int, default=CONCURRENCY, help="batches in flight")
+    imp.add_argument('--checkpoint', help="default: <path>.checkpoint")
+    imp.add_argument('--errors', help="rejected rows as JSONL; default: <path>.errors.jsonl")
+    imp.add_argument('--qr-folder', default=os.path.join('static', 'resumes', 'qr_codes'),
+                     help="where mentor UPI QR codes are stored")
+    exp = sub.add_parser('export', help="stream a collection to JSONL")
+    exp.add_argument('collection')
+    exp.add_argument('path', help="output file, or - for stdout")
+    exp.add_argument('--page-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from repositories import Repositories, backend_from_env
+    repos = Repositories(backend_from_env())
+
+    if args.command == 'export':
+        count = export_collection(repos.backend, args.collection, args.path, args.page_size)
+        print(f"Exported {count} documents from {args.collection}", file=sys.stderr)
+        return
+
+    qr_store = None
+    if args.kind == 'mentors':
+        from content_store import ContentStore
+        qr_store = ContentStore(args.qr_folder)
+    start = time.perf_counter()
+    written, skipped = import_file(
+        repos, args.kind, args.path, args.format, args.batch_size, args.concurrency,
+        checkpoint_path=args.checkpoint or f"{args.path}.checkpoint",
+        errors_path=args.errors or f"{args.path}.errors.jsonl",
+        qr_store=qr_store)
+    print(f"Imported {written} {args.kind} ({skipped} rejected) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
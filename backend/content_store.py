@@ -0,0 +1,107 @@
+import hashlib
+import os
+import re
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+KEY_PATTERN = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+class ContentStore:
+    """Files stored once under the sha256 of their content.
+
+    Keys look like 'ab/abcdef....png' (sharded on the first two hex digits),
+    so identical content maps to one file and a key never changes meaning.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        if not KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid content key: {key}")
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    @staticmethod
+    def make_key(digest, ext):
+        return f"{digest[:2]}/{digest}.{ext.lower()}"
+
+    def put_stream(self, stream, ext, chunk_size=CHUNK_SIZE):
+        """Stream to a temp file while hashing, then move into place (or drop if already stored)"""
+        return self.put_chunks(iter(lambda: stream.read(chunk_size), b''), ext)
+
+    def put_chunks(self, chunks, ext, check=None):
+        """Store the joined chunks; check(tmp_path), if given, may raise to reject them first"""
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    out.write(chunk)
+            if check is not None:
+                check(tmp_path)
+            key = self.make_key(digest.hexdigest(), ext)
+            self._commit(tmp_path, key)
+            return key
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_bytes(self, data, ext):
+        key = self.make_key(hashlib.sha256(data).hexdigest(), ext)
+        if not self.exists(key):
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+            with os.fdopen(fd, 'wb') as out:
+                out.write(data)
+            self._commit(tmp_path, key)
+        return key
+
+    def _alias_path(self, name):
+        return os.path.join(self.root, 'aliases', hashlib.sha256(name.encode()).hexdigest())
+
+    def get_alias(self, name):
+        """Key previously stored for a derived input (e.g. a UPI URI), if any"""
+        try:
+            with open(self._alias_path(name)) as f:
+                key = f.read().strip()
+        except FileNotFoundError:
+            return None
+        # A damaged alias file is a miss, so the caller regenerates and overwrites it
+        return key if KEY_PATTERN.match(key) and self.exists(key) else None
+
+    def set_alias(self, name, key):
+        """Written to a temp file and renamed, so readers never see a partial key"""
+        path = self._alias_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(key)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def _commit(self, tmp_path, key):
+        final = self.path(key)
+        if os.path.exists(final):
+            try:
+                os.utime(final)  # Re-stored content counts as fresh for retention
+            except FileNotFoundError:
+                pass  # Swept meanwhile: store this copy in its place
+            else:
+                os.remove(tmp_path)
+                return
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.replace(tmp_path, final)
+
+
+def etag_for(key):
+    """The content hash doubles as a strong ETag"""
+    return os.path.basename(key).split('.', 1)[0]
@@ -0,0 +1,209 @@
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from email.message import EmailMessage
+from metrics import span
+
+OUTBOX_DB = os.getenv('OUTBOX_DB', 'outbox.db')
+# A claimed batch not marked sent/failed within this many seconds (its
+# sender died mid-batch) goes back to pending
+CLAIM_TIMEOUT = int(os.getenv('OUTBOX_CLAIM_TIMEOUT', 600))
+
+
+class EmailOutbox:
+    """Persistent queue of outgoing mail; enqueue() is all a request does.
+
+    Every gunicorn worker runs an OutboxSender against the same table, so
+    senders claim() rows (status 'sending') rather than just reading them.
+    """
+
+    def __init__(self, db_path=OUTBOX_DB, claim_timeout=CLAIM_TIMEOUT):
+        self.db_path = db_path
+        self.claim_timeout = claim_timeout
+        self.wakeup = threading.Event()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recipient TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt REAL NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    claimed_at REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+            if 'claimed_at' not in columns:
+                conn.execute("ALTER TABLE outbox ADD COLUMN claimed_at REAL")
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def enqueue(self, to, subject, body):
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute("""
+                INSERT INTO outbox (recipient, subject, body, next_attempt, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (to, subject, body, now, now))
+        self.wakeup.set()
+        return cur.lastrowid
+
+    def claim(self, limit):
+        """Mark up to `limit` due messages as 'sending' and return them.
+
+        The select and update run in one write transaction, so two senders
+        never get the same row. Rows left 'sending' past claim_timeout are
+        due again.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("""
+                SELECT id, recipient, subject, body, attempts FROM outbox
+                WHERE (status = 'pending' AND next_attempt <= ?)
+                   OR (status = 'sending' AND claimed_at <= ?)
+                ORDER BY next_attempt LIMIT ?
+            """, (now, now - self.claim_timeout, limit)).fetchall()
+            conn.executemany("UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                             [(now, row[0]) for row in rows])
+        return rows
+
+    def mark_sent(self, ids):
+        with self._connect() as conn:
+            conn.executemany("UPDATE outbox SET status = 'sent', attempts = attempts + 1 WHERE id = ?",
+                             [(i,) for i in ids])
+
+    def mark_failed(self, message_id, attempts, error, next_attempt, dead):
+        with self._connect() as conn:
+            conn.execute("""
+                UPDATE outbox SET status = ?, attempts = ?, last_error = ?, next_attempt = ?
+                WHERE id = ?
+            """, ('dead' if dead else 'pending', attempts, error, next_attempt, message_id))
+
+    def counts(self):
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+
+class OutboxSender:
+    """Background thread draining the outbox over one reused SMTP connection.
+
+    Failed messages back off exponentially and are dead-lettered
+    (status 'dead') after max_attempts.
+    """
+
+    def __init__(self, outbox, host, port, username=None, password=None, use_tls=True,
+                 sender=None, batch_size=50, max_attempts=5, backoff=30, poll_seconds=5):
+        self.outbox = outbox
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender or username
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_seconds = poll_seconds
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+        self.connections = 0
+        self._smtp = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def _connection(self):
+        if self._smtp is not None:
+            return self._smtp
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+        self.connections += 1
+        return smtp
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def send_batch(self):
+        """Send one batch of due messages; returns how many were attempted"""
+        rows = self.outbox.claim(self.batch_size)
+        if not rows:
+            return 0
+        sent = []
+        for message_id, to, subject, body, attempts in rows:
+            msg = EmailMessage()
+            msg['From'] = self.sender
+            msg['To'] = to
+            msg['Subject'] = subject
+            msg.set_content(body)
+            try:
+                try:
+                    with span('smtp', 'send_message'):
+                        self._connection().send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # Pooled connection went stale while idle; reconnect once
+                    self._close()
+                    with span('smtp', 'send_message'):
+                        self._connection().send_message(msg)
+                sent.append(message_id)
+            except Exception as e:
+                self._close()
+                attempts += 1
+                dead = attempts >= self.max_attempts
+                retry_at = time.time() + self.backoff * (2 ** (attempts - 1))
+                self.outbox.mark_failed(message_id, attempts, str(e), retry_at, dead)
+                self.failed += 1
+                if dead:
+                    self.dead += 1
+                    print(f"Email to {to} dead-lettered: {str(e)}")
+        self.outbox.mark_sent(sent)
+        self.sent += len(sent)
+        return len(rows)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self.outbox.wakeup.clear()
+            try:
+                while self.send_batch() == self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"Outbox sender error: {str(e)}")
+                self._close()
+            self.outbox.wakeup.wait(self.poll_seconds)
+        self._close()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='outbox-sender', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self.outbox.wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def stats(self):
+        stats = {'sent': self.sent, 'failed': self.failed, 'dead': self.dead,
+                 'connections': self.connections}
+        stats.update({f"queued_{status}": n for status, n in self.outbox.counts().items()})
+        return stats
@@ -0,0 +1,426 @@
+"""Batch analytics over session feedback.
+
+Students leave `feedback` on completed sessions (stamped `feedback_at`).
+This job reads feedback newer than its checkpoint, analyzes what it hasn't
+seen yet and rolls the results up into one mentor_insights document per
+mentor (sentiment counts, strengths, improvement areas, follow-up topics):
+
+    python feedback_analytics.py run [--pack-size 10] [--fake]
+    python feedback_analytics.py rebuild [mentor_email ...]
+
+- Feedback is identified by a hash of its text. A session whose
+  feedback_hash matches is already counted, identical texts are analyzed
+  once, and analyses are cached under analyze_session_feedback's prompt
+  key, so the two share results.
+- Up to PACK_SIZE feedbacks (about PACK_CHARS of text) go in one request.
+  Replies are parsed and validated; feedback missing or malformed in a
+  packed reply is retried on its own.
+- A session's analysis is stored on the session and swapped into its
+  mentor's rollup in the same transaction, so edited feedback replaces its
+  old contribution instead of being counted twice.
+- The checkpoint is the feedback_at up to which everything is counted. It
+  stops at feedback that failed, so the next run retries it. Losing the
+  checkpoint only costs a re-scan, since counted sessions are skipped by hash.
+
+--fake answers with gemini_client.FakeModel, for trying the job locally.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+import gemini_helper
+from gemini_client import AsyncGeminiClient, FakeModel
+from response_cache import prompt_key
+from metrics import registry
+
+PACK_SIZE = 10
+PACK_CHARS = 8000
+PAGE_SIZE = 200
+SENTIMENTS = ('Positive', 'Neutral', 'Negative')
+# analysis list field -> phrases kept per feedback
+TOPIC_FIELDS = {'strengths': 3, 'improvements': 2, 'follow_up_topics': 5}
+MAX_TOPIC_LENGTH = 80
+MAX_TOPICS = 100  # distinct phrases kept per rollup field, most frequent first
+
+
+def normalize_feedback(text):
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+
+def feedback_hash(text):
+    return hashlib.sha256(normalize_feedback(text).encode()).hexdigest()
+
+
+# --- Parsing and validation ---
+def parse_json(text):
+    """JSON value in a model reply, tolerating a ``` fence or prose around it"""
+    text = re.sub(r'^```(?:json)?|```$', '', text.strip()).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    starts = [i for i in (text.find('['), text.find('{')) if i != -1]
+    if starts:
+        start = min(starts)
+        end = text.rfind(']' if text[start] == '[' else '}')
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError:
+            pass
+    raise ValueError("Reply is not JSON")
+
+
+def clean_topic(value):
+    topic = re.sub(r'\s+', ' ', str(value)).strip(' .,;:-*')
+    return topic[:MAX_TOPIC_LENGTH]
+
+
+def validate_analysis(data):
+    """Normalized {sentiment, strengths, improvements, follow_up_topics}; ValueError if unusable"""
+    if not isinstance(data, dict):
+        raise ValueError("Analysis is not an object")
+    sentiment = str(data.get('sentiment', '')).strip().capitalize()
+    if sentiment not in SENTIMENTS:
+        raise ValueError(f"Unknown sentiment {data.get('sentiment')!r}")
+    analysis = {'sentiment': sentiment}
+    for field, limit in TOPIC_FIELDS.items():
+        values = data.get(field) or []
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list):
+            raise ValueError(f"{field} is not a list")
+        topics = [clean_topic(v) for v in values if isinstance(v, (str, int, float))]
+        analysis[field] = [t for t in topics if t][:limit]
+    return analysis
+
+
+def parse_packed(text, ids):
+    """{id: analysis} for the valid entries of a packed reply; others are left out"""
+    data = parse_json(text)
+    if isinstance(data, dict):
+        data = data.get('results', [data])
+    results = {}
+    for item in data if isinstance(data, list) else []:
+        if isinstance(item, dict) and str(item.get('id')) in ids:
+            try:
+                results[str(item['id'])] = validate_analysis(item)
+            except ValueError:
+                pass
+    return results
+
+
+def pack(feedbacks, size=PACK_SIZE, chars=PACK_CHARS):
+    """Split [(hash, text)] into packs of at most `size` feedbacks and about `chars` of text"""
+    packs, current, length = [], [], 0
+    for item in feedbacks:
+        if current and (len(current) >= size or length + len(item[1]) > chars):
+            packs.append(current)
+            current, length = [], 0
+        current.append(item)
+        length += len(item[1])
+    if current:
+        packs.append(current)
+    return packs
+
+
+class FeedbackAnalyzer:
+    """Analyses for feedback texts: cached ones first, the rest in packed requests"""
+
+    def __init__(self, client, pack_size=PACK_SIZE, pack_chars=PACK_CHARS):
+        self.client = client
+        self.pack_size = pack_size
+        self.pack_chars = pack_chars
+        self.ttl = gemini_helper.CACHE_TTLS['analyze_session_feedback']
+
+    @staticmethod
+    def _key(text):
+        prompt = gemini_helper.session_feedback_prompt(text)
+        return prompt_key('analyze_session_feedback', gemini_helper.MODEL_NAME, prompt)
+
+    def _cached(self, text):
+        reply = gemini_helper.response_cache.get(self._key(text))
+        if reply is None:
+            return None
+        try:
+            return validate_analysis(parse_json(reply))
+        except ValueError:
+            return None
+
+    def _store(self, text, analysis):
+        if self.ttl:
+            gemini_helper.response_cache.put(self._key(text), json.dumps(analysis), self.ttl)
+
+    async def analyze(self, texts):
+        """({hash: analysis}, {hash: error}) for {hash: text}"""
+        results, errors, todo = {}, {}, []
+        for h, text in texts.items():
+            analysis = self._cached(text)
+            if analysis is None:
+                todo.append((h, text))
+            else:
+                results[h] = analysis
+        registry.inc('feedback_analyses_total', len(results), source='cache')
+
+        packs = pack(todo, self.pack_size, self.pack_chars)
+        prompts = [gemini_helper.feedback_batch_prompt([(str(i), t) for i, (_, t) in enumerate(p, 1)])
+                   for p in packs]
+        replies = await self.client.gather('analyze_session_feedback_batch', prompts)
+        retry = []
+        for p, reply in zip(packs, replies):
+            parsed = {}
+            if not isinstance(reply, Exception):
+                try:
+                    parsed = parse_packed(reply, {str(i) for i in range(1, len(p) + 1)})
+                except ValueError:
+                    pass
+            for i, (h, text) in enumerate(p, 1):
+                if str(i) in parsed:
+                    results[h] = parsed[str(i)]
+                    self._store(text, parsed[str(i)])
+                else:
+                    retry.append((h, text))
+        registry.inc('feedback_analyses_total', len(todo) - len(retry), source='packed')
+
+        # Analyze what a packed reply left out one at a time
+        prompts = [gemini_helper.session_feedback_prompt(text) for _, text in retry]
+        replies = await self.client.gather('analyze_session_feedback', prompts, use_cache=False)
+        for (h, text), reply in zip(retry, replies):
+            try:
+                if isinstance(reply, Exception):
+                    raise reply
+                results[h] = validate_analysis(parse_json(reply))
+                self._store(text, results[h])
+                registry.inc('feedback_analyses_total', source='single')
+            except Exception as e:
+                errors[h] = str(e)
+                registry.inc('feedback_analyses_total', source='failed')
+        return results, errors
+
+
+# --- Rollups ---
+def empty_insights(mentor_email):
+    return {
+        'mentor_email': mentor_email,
+        'analyzed': 0,
+        'sentiment': {s: 0 for s in SENTIMENTS},
+        'strengths': {},
+        'improvements': {},
+        'follow_up_topics': {},
+        'updated_at': None,
+    }
+
+
+def apply_analysis(insights, old, new, now=None):
+    """Swap a session's old analysis in the rollup for its new one.
+
+    Topic counters are keyed by the casefolded phrase and capped at
+    MAX_TOPICS, dropping the rarest.
+    """
+    for analysis, sign in ((old, -1), (new, 1)):
+        if not analysis:
+            continue
+        insights['analyzed'] = max(insights['analyzed'] + sign, 0)
+        sentiment = insights['sentiment']
+        sentiment[analysis['sentiment']] = max(sentiment.get(analysis['sentiment'], 0) + sign, 0)
+        for field in TOPIC_FIELDS:
+            counter = insights[field]
+            for topic in analysis.get(field, []):
+                key = topic.casefold()
+                count = counter.get(key, 0) + sign
+                if count > 0:
+                    counter[key] = count
+                else:
+                    counter.pop(key, None)
+    for field in TOPIC_FIELDS:
+        if len(insights[field]) > MAX_TOPICS:
+            top = sorted(insights[field].items(), key=lambda item: (-item[1], item[0]))
+            insights[field] = dict(top[:MAX_TOPICS])
+    insights['updated_at'] = now or datetime.now().isoformat()
+    return insights
+
+
+def record_analyses(repos, mentor_email, items):
+    """Store [(session_id, hash, analysis)] on one mentor's sessions and fold
+    them into the mentor's insights atomically; returns how many were applied.
+
+    A session whose feedback changed since it was read, or that another run
+    already counted, is left alone.
+    """
+    keys = [(repos.sessions, session_id) for session_id, _, _ in items]
+    applied = []
+
+    def update(docs):
+        *sessions, insights = docs
+        insights = insights or empty_insights(mentor_email)
+        applied.clear()
+        out = []
+        for (session_id, h, analysis), data in zip(items, sessions):
+            if data is None or data.get('feedback_hash') == h or feedback_hash(data.get('feedback')) != h:
+                out.append(None)
+                continue
+            apply_analysis(insights, data.get('feedback_analysis'), analysis)
+            out.append(dict(data, feedback_hash=h, feedback_analysis=analysis))
+            applied.append(session_id)
+        return out + [insights]
+
+    repos.transact(keys + [(repos.mentor_insights, mentor_email)], update)
+    return len(applied)
+
+
+def rebuild_insights(repos, mentor_email):
+    """Recompute one mentor's insights from the analyses stored on their sessions"""
+    insights = empty_insights(mentor_email)
+    for _, data in repos.sessions.query_items([('mentor_email', '==', mentor_email)]):
+        apply_analysis(insights, None, data.get('feedback_analysis'))
+    repos.mentor_insights.set(mentor_email, insights)
+    return insights
+
+
+def rebuild_all(repos):
+    """Recompute every mentor's insights in one pass over sessions"""
+    all_insights = {}
+    for _, data in repos.sessions.stream():
+        if data.get('feedback_analysis') and data.get('mentor_email'):
+            insights = all_insights.setdefault(data['mentor_email'], empty_insights(data['mentor_email']))
+            apply_analysis(insights, None, data['feedback_analysis'])
+    with repos.batch() as batch:
+        for email, insights in all_insights.items():
+            batch.set(repos.mentor_insights, email, insights)
+    return len(all_insights)
+
+
+# --- Job ---
+class Checkpoint:
+    """feedback_at up to which every feedback is counted, saved atomically"""
+
+    def __init__(self, path):
+        self.path = path
+        self.since = ''
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.since = json.load(f).get('feedback_at', '')
+
+    def save(self, since):
+        self.since = since
+        if self.path:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'feedback_at': since}, f)
+            os.replace(tmp, self.path)
+
+
+def feedback_pages(repos, since='', page_size=PAGE_SIZE):
+    """Sessions with feedback_at >= since, oldest first, a page at a time"""
+    boundary = set()  # ids already returned with feedback_at == since
+    while True:
+        page = repos.sessions.query_items([('feedback_at', '>=', since)], order_by='feedback_at',
+                                          limit=page_size + len(boundary))
+        fresh = [(i, d) for i, d in page if i not in boundary]
+        if fresh:
+            yield fresh
+        if len(page) < page_size + len(boundary):
+            return
+        last = page[-1][1]['feedback_at']
+        if last != since:
+            since, boundary = last, set()
+        boundary |= {i for i, d in fresh if d['feedback_at'] == since}
+
+
+async def run(repos, analyzer, checkpoint, page_size=PAGE_SIZE):
+    """Analyze and roll up feedback newer than the checkpoint; returns counts"""
+    stats = {'sessions': 0, 'analyzed': 0, 'applied': 0, 'failed': 0}
+    blocked = False
+    for page in feedback_pages(repos, checkpoint.since, page_size):
+        stats['sessions'] += len(page)
+        hashes = {i: feedback_hash(d.get('feedback')) for i, d in page}
+        fresh = [(i, d) for i, d in page
+                 if normalize_feedback(d.get('feedback')) and d.get('feedback_hash') != hashes[i]]
+        texts = {hashes[i]: d['feedback'] for i, d in fresh}
+        results, errors = await analyzer.analyze(texts)
+        stats['analyzed'] += len(results)
+        stats['failed'] += len(errors)
+
+        by_mentor = {}
+        for i, d in fresh:
+            if hashes[i] in results:
+                by_mentor.setdefault(d['mentor_email'], []).append((i, hashes[i], results[hashes[i]]))
+        for mentor_email, items in by_mentor.items():
+            stats['applied'] += record_analyses(repos, mentor_email, items)
+
+        # Hold the checkpoint at the first failure so the next run retries it
+        failed = [d['feedback_at'] for i, d in fresh if hashes[i] in errors]
+        if failed and not blocked:
+            checkpoint.save(min(failed))
+            blocked = True
+        elif not blocked:
+            checkpoint.save(page[-1][1]['feedback_at'])
+        print(f"\r{stats['sessions']} sessions read, {stats['applied']} counted, "
+              f"{stats['failed']} failed", end='', flush=True)
+    print()
+    return stats
+
+
+def fake_feedback_reply(prompt):
+    """FakeModel reply: plausible analyses for the feedback in a prompt"""
+    from skill_extractor import get_matcher
+
+    def analyze(text):
+        lower = text.lower()
+        negative = any(w in lower for w in ('late', 'confusing', 'rushed', 'unprepared', 'not helpful'))
+        positive = any(w in lower for w in ('great', 'helpful', 'excellent', 'clear', 'thanks'))
+        strengths = [s for w, s in (('clear', 'Clear explanations'), ('example', 'Practical examples'),
+                                    ('patient', 'Patience'), ('prepared', 'Well prepared'))
+                     if w in lower and not (w == 'prepared' and 'unprepared' in lower)]
+        return {
+            'strengths': strengths or ['Subject knowledge'],
+            'improvements': ['Time management'] if negative else ['More hands-on practice'],
+            'follow_up_topics': get_matcher().extract(text)[:3],
+            'sentiment': 'Negative' if negative else 'Positive' if positive else 'Neutral',
+        }
+
+    if 'feedbacks separately' in prompt:
+        start = prompt.index('[')
+        entries, _ = json.JSONDecoder().raw_decode(prompt, start)
+        return json.dumps([dict(analyze(e['feedback']), id=e['id']) for e in entries])
+    text = prompt.split('feedback:', 1)[1].split('Identify:', 1)[0]
+    return "```json\n" + json.dumps(analyze(text)) + "\n```"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    job = sub.add_parser('run', help="analyze new feedback and update mentor insights")
+    job.add_argument('--checkpoint', default=os.getenv('FEEDBACK_CHECKPOINT', 'feedback_analytics.checkpoint'))
+    job.add_argument('--pack-size', type=int, default=PACK_SIZE, help="feedbacks per model request")
+    job.add_argument('--pack-chars', type=int, default=PACK_CHARS, help="feedback characters per request")
+    job.add_argument('--page-size', type=int, default=PAGE_SIZE, help="sessions read at a time")
+    job.add_argument('--fake', action='store_true', help="use a local fake model instead of Gemini")
+    rebuild = sub.add_parser('rebuild', help="recompute insights from stored analyses")
+    rebuild.add_argument('mentors', nargs='*')
+    args = parser.parse_args(argv)
+
+    from repositories import Repositories, backend_from_env
+    repos = Repositories(backend_from_env())
+
+    if args.command == 'rebuild':
+        if args.mentors:
+            for email in args.mentors:
+                rebuild_insights(repos, email)
+                print(f"Rebuilt insights for {email}")
+        else:
+            print(f"Rebuilt {rebuild_all(repos)} mentor insights")
+        return
+
+    model = FakeModel(latency=0.05, reply=fake_feedback_reply) if args.fake else None
+    analyzer = FeedbackAnalyzer(AsyncGeminiClient(model=model), args.pack_size, args.pack_chars)
+    stats = asyncio.run(run(repos, analyzer, Checkpoint(args.checkpoint), args.page_size))
+    print(f"Counted {stats['applied']} of {stats['sessions']} sessions read "
+          f"({stats['analyzed']} analyses, {stats['failed']} failed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import random
+import time
+import weakref
+import gemini_helper
+from response_cache import prompt_key
+from metrics import span
+
+GEMINI_CONCURRENCY = int(os.getenv('GEMINI_CONCURRENCY', 4))
+GEMINI_RPM = float(os.getenv('GEMINI_RPM', 60))
+# HTTP statuses worth retrying; anything else (bad prompt, auth, safety block) fails at once
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient(error):
+    """Whether a model call might succeed if retried"""
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    code = getattr(error, 'code', None)  # google.api_core errors carry the HTTP status
+    return isinstance(code, int) and code in RETRYABLE_STATUS
+
+
+def loop_local(store, factory):
+    """factory() made once per running event loop; asyncio primitives bind
+    to the loop that first uses them, so they can't be shared across loops"""
+    loop = asyncio.get_running_loop()
+    value = store.get(loop)
+    if value is None:
+        value = store[loop] = factory()
+    return value
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._locks = weakref.WeakKeyDictionary()
+
+    async def acquire(self):
+        async with loop_local(self._locks, asyncio.Lock):
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncGeminiClient:
+    """Concurrent, rate-limited wrapper around the gemini_helper prompts.
+
+    Shares gemini_helper's response cache, so repeats are answered without
+    spending quota. Pass `model` (e.g. FakeModel) to run without the API.
+    One client can be used from several event loops (e.g. successive run()
+    calls); the concurrency limit applies per loop, the rate limit overall.
+    """
+
+    def __init__(self, model=None, concurrency=GEMINI_CONCURRENCY, rpm=GEMINI_RPM,
+                 retries=3, backoff=0.5):
+        self.model = model
+        self.retries = retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._bucket = TokenBucket(rpm / 60.0)
+
+    async def _call_model(self, prompt):
+        model = self.model or gemini_helper.get_model()
+        if hasattr(model, 'generate_content_async'):
+            response = await model.generate_content_async(prompt)
+        else:
+            response = await asyncio.to_thread(model.generate_content, prompt)
+        return response.text
+
+    async def generate(self, function, prompt, use_cache=True):
+        ttl = gemini_helper.CACHE_TTLS.get(function, 0) if use_cache else 0
+        key = prompt_key(function, gemini_helper.MODEL_NAME, prompt)
+        if ttl:
+            cached = gemini_helper.response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        async with loop_local(self._semaphores, lambda: asyncio.Semaphore(self.concurrency)):
+            for attempt in range(self.retries + 1):
+                await self._bucket.acquire()
+                try:
+                    with span('gemini', function):
+                        text = await self._call_model(prompt)
+                    break
+                except Exception as e:
+                    if attempt == self.retries or not is_transient(e):
+                        raise
+                    delay = self.backoff * (2 ** attempt)
+                    await asyncio.sleep(delay + random.uniform(0, delay))
+
+        if ttl:
+            gemini_helper.response_cache.put(key, text, ttl)
+        return text
+
+    async def gather(self, function, prompts, use_cache=True):
+        """Run prompts concurrently; results (or exceptions) come back in input order"""
+        return await asyncio.gather(
+            *(self.generate(function, p, use_cache) for p in prompts),
+            return_exceptions=True)
+
+    async def generate_interview_questions_batch(self, roles, experience_level, use_cache=True):
+        prompts = [gemini_helper.interview_questions_prompt(r, experience_level) for r in roles]
+        return await self.gather('generate_interview_questions', prompts, use_cache)
+
+    async def analyze_session_feedback_batch(self, feedback_texts, use_cache=True):
+        prompts = [gemini_helper.session_feedback_prompt(t) for t in feedback_texts]
+        return await self.gather('analyze_session_feedback', prompts, use_cache)
+
+
+class FakeModelError(Exception):
+    """Injected failure; looks like a 503 from the API, so clients retry it"""
+    code = 503
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Local stand-in for GenerativeModel with latency and error injection"""
+
+    def __init__(self, latency=0.05, error_rate=0.0, reply=None, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reply = reply or (lambda prompt: f"fake response ({len(prompt)} chars)")
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _respond(self, prompt):
+        self.calls += 1
+        if self._random.random() < self.error_rate:
+            raise FakeModelError("Injected model error")
+        return FakeResponse(self.reply(prompt))
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt)
+        time.sleep(self.latency)
+        return self._respond(prompt)
+
+    def _stream(self, prompt, chunks=4):
+        """Split the reply into chunks spread over `latency`"""
+        text = self._respond(prompt).text
+        size = max(1, -(-len(text) // chunks))
+        for i in range(0, len(text), size):
+            time.sleep(self.latency / chunks)
+            yield FakeResponse(text[i:i + size])
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+
+def run(coro):
+    """Convenience for calling the async client from sync Flask routes"""
+    return asyncio.run(coro)
@@ -1,15 +1,79 @@
 import google.generativeai as genai
 from dotenv import load_dotenv
+import json
 import os
+import time
 from datetime import datetime
+from response_cache import ResponseCache, prompt_key
+from metrics import span, registry
 
 load_dotenv()
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 
+MODEL_NAME = 'gemini-pro'
+
+# Seconds a cached response stays valid per helper (0 = never cached)
+CACHE_TTLS = {
+    'recommend_mentors': 6 * 3600,
+    'generate_session_plan': 24 * 3600,
+    'compose_mentor_email': 0,
+    'generate_interview_questions': 24 * 3600,
+    'analyze_session_feedback': 7 * 24 * 3600,
+}
+
+response_cache = ResponseCache(max_entries=int(os.getenv('GEMINI_CACHE_SIZE', 1000)),
+                               db_path=os.getenv('GEMINI_CACHE_DB'))
+_model = None
+
+def get_model():
+    """Shared GenerativeModel, created on first use"""
+    global _model
+    if _model is None:
+        _model = genai.GenerativeModel(MODEL_NAME)
+    return _model
+
+def generate(function, prompt, use_cache=True):
+    """Run a prompt through the shared model, answering repeats from the cache"""
+    ttl = CACHE_TTLS.get(function, 0) if use_cache else 0
+    key = prompt_key(function, MODEL_NAME, prompt)
+    if ttl:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+    with span('gemini', function):
+        text = get_model().generate_content(prompt).text
+    if ttl:
+        response_cache.put(key, text, ttl)
+    return text
+
+def generate_stream(function, prompt, use_cache=True):
+    """Yield the response text in chunks as the model produces them.
+
+    A cached response comes back as a single chunk. The full text is cached
+    once the stream completes; an interrupted stream caches nothing.
+    """
+    ttl = CACHE_TTLS.get(function, 0) if use_cache else 0
+    key = prompt_key(function, MODEL_NAME, prompt)
+    if ttl:
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    with span('gemini', function):
+        start = time.perf_counter()
+        for chunk in get_model().generate_content(prompt, stream=True):
+            if not parts:
+                registry.observe('gemini_time_to_first_token_seconds', time.perf_counter() - start,
+                                 operation=function)
+            parts.append(chunk.text)
+            yield chunk.text
+    if ttl:
+        response_cache.put(key, "".join(parts), ttl)
+
 # 1. Mentor-Student Matching
-def recommend_mentors(student_skills, student_goal):
+def recommend_mentors(student_skills, student_goal, use_cache=True):
     """Recommend best-fit mentors using AI"""
-    model = genai.GenerativeModel('gemini-pro')
     prompt = f"""
     Recommend mentors for a student with:
     - Skills: {', '.join(student_skills)}
@@ -23,14 +87,11 @@ def recommend_mentors(student_skills, student_goal):
     Format response as:
     - Mentor Name: Match Reason (1-2 sentences)
     """
-    response = model.generate_content(prompt)
-    return response.text
+    return generate('recommend_mentors', prompt, use_cache)
 
 # 2. Session Plan Generator
-def generate_session_plan(mentor_expertise, student_goals):
-    """Create customized session agenda"""
-    model = genai.GenerativeModel('gemini-pro')
-    prompt = f"""
+def session_plan_prompt(mentor_expertise, student_goals):
+    return f"""
     Create a 1-hour mentorship session plan between:
     Mentor Expertise: {mentor_expertise}
     Student Goals: {student_goals}
@@ -43,13 +104,19 @@ def generate_session_plan(mentor_expertise, student_goals):
     
     Format as markdown bullet points
     """
-    response = model.generate_content(prompt)
-    return response.text
+
+def generate_session_plan(mentor_expertise, student_goals, use_cache=True):
+    """Create customized session agenda"""
+    prompt = session_plan_prompt(mentor_expertise, student_goals)
+    return generate('generate_session_plan', prompt, use_cache)
+
+def stream_session_plan(mentor_expertise, student_goals, use_cache=True):
+    """generate_session_plan, streamed in chunks"""
+    return generate_stream('generate_session_plan', session_plan_prompt(mentor_expertise, student_goals), use_cache)
 
 # 3. Automated Email Composer
-def compose_mentor_email(student_info, session_details):
+def compose_mentor_email(student_info, session_details, use_cache=True):
     """Generate personalized mentor notification"""
-    model = genai.GenerativeModel('gemini-pro')
     prompt = f"""
     Compose a professional email to notify a mentor about a new session request:
     
@@ -66,14 +133,11 @@ def compose_mentor_email(student_info, session_details):
     Tone: Professional yet friendly
     Include: Acceptance link placeholder
     """
-    response = model.generate_content(prompt)
-    return response.text
+    return generate('compose_mentor_email', prompt, use_cache)
 
 # 4. Interview Question Generator
-def generate_interview_questions(role, experience_level):
-    """Create role-specific interview questions"""
-    model = genai.GenerativeModel('gemini-pro')
-    prompt = f"""
+def interview_questions_prompt(role, experience_level):
+    return f"""
     Generate 5 technical interview questions for:
     - Role: {role}
     - Experience Level: {experience_level}
@@ -87,14 +151,23 @@ def generate_interview_questions(role, experience_level):
     - Mark difficulty (Easy/Medium/Hard)
     - Include key concepts tested
     """
-    response = model.generate_content(prompt)
-    return response.text
+
+def generate_interview_questions(role, experience_level, use_cache=True):
+    """Create role-specific interview questions"""
+    prompt = interview_questions_prompt(role, experience_level)
+    return generate('generate_interview_questions', prompt, use_cache)
+
+def stream_interview_questions(role, experience_level, use_cache=True):
+    """generate_interview_questions, streamed in chunks"""
+    prompt = interview_questions_prompt(role, experience_level)
+    return generate_stream('generate_interview_questions', prompt, use_cache)
 
 # 5. Post-Session Feedback Analyzer
-def analyze_session_feedback(feedback_text):
-    """Extract insights from session feedback"""
-    model = genai.GenerativeModel('gemini-pro')
-    prompt = f"""
+FEEDBACK_JSON_FORMAT = """{"strengths": ["..."], "improvements": ["..."], "follow_up_topics": ["..."],
+     "sentiment": "Positive" | "Neutral" | "Negative"}"""
+
+def session_feedback_prompt(feedback_text):
+    return f"""
     Analyze this mentorship session feedback:
     {feedback_text}
     
@@ -104,7 +177,29 @@ def analyze_session_feedback(feedback_text):
     3. Suggested follow-up topics
     4. Overall sentiment (Positive/Neutral/Negative)
     
-    Format as JSON
+    Respond with only this JSON object, using short phrases:
+    {FEEDBACK_JSON_FORMAT}
     """
-    response = model.generate_content(prompt)
-    return response.text
+
+def feedback_batch_prompt(feedbacks):
+    """One prompt analyzing several feedbacks, given as [(id, text)]"""
+    entries = json.dumps([{'id': fid, 'feedback': text} for fid, text in feedbacks], indent=1)
+    return f"""
+    Analyze each of these mentorship session feedbacks separately:
+    {entries}
+    
+    For each one identify:
+    1. 3 strengths
+    2. 2 improvement areas
+    3. Suggested follow-up topics
+    4. Overall sentiment (Positive/Neutral/Negative)
+    
+    Respond with only a JSON array holding one object per feedback, using short phrases:
+    [{{"id": "<id>", "strengths": ["..."], "improvements": ["..."], "follow_up_topics": ["..."],
+      "sentiment": "Positive" | "Neutral" | "Negative"}}]
+    """
+
+def analyze_session_feedback(feedback_text, use_cache=True):
+    """Extract insights from session feedback"""
+    prompt = session_feedback_prompt(feedback_text)
+    return generate('analyze_session_feedback', prompt, use_cache)
@@ -0,0 +1,14 @@
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+# Admission control (admission.py) holds some threads for uploads and AI streams
+threads = int(os.getenv('WEB_THREADS', 8))
+# Import and warm the app once in the master; workers share it copy-on-write
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Threads don't survive fork, so background workers start per worker
+    from wsgi import app
+    app.extensions['services'].start_workers()
@@ -0,0 +1,460 @@
+"""End-to-end load test with local stand-ins for Firestore, Stripe, SMTP and Gemini.
+
+Each virtual user runs the full journey: mentor registers, student
+registers with a resume, opens the dashboard, requests a session, the
+mentor accepts, the student lands on payment success and the mentor
+opens their dashboard.
+
+    python loadtest.py --users 200 --concurrency 20 --out results.json
+    python loadtest.py --users 200 --concurrency 20 --compare results.json
+
+--overload serves the app over HTTP from a fixed pool of threads (like one
+gunicorn worker) and times cheap routes alone, then while resume uploads
+and AI streams flood it, with admission control on (journeys run without
+it). Add --no-admission to see the same flood without it.
+
+    python loadtest.py --overload --server-threads 8 --flood 24 --duration 10
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+RESUME_PDF = b'%PDF-1.4\n' + b'Python SQL Git Docker machine learning\n' * 200
+
+
+# --- Fake Firestore ---
+class LatencyBackend:
+    """Wraps a repositories backend and adds a fixed delay to every call"""
+
+    def __init__(self, backend, latency):
+        self.backend = backend
+        self.latency = latency
+
+    def new_id(self, collection):
+        return self.backend.new_id(collection)
+
+    def get_all(self, keys):
+        time.sleep(self.latency)
+        return self.backend.get_all(keys)
+
+    def query_items(self, collection, filters=(), order_by=None, limit=None):
+        time.sleep(self.latency)
+        return self.backend.query_items(collection, filters, order_by, limit)
+
+    def stream(self, collection, page_size=500):
+        time.sleep(self.latency)
+        return self.backend.stream(collection, page_size)
+
+    def transact(self, keys, fn):
+        time.sleep(2 * self.latency)
+        return self.backend.transact(keys, fn)
+
+    def commit(self, writes):
+        time.sleep(self.latency)
+        return self.backend.commit(writes)
+
+
+# --- Fake SMTP ---
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 loadtest ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply("250 loadtest")
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                time.sleep(self.server.latency)
+                self.server.messages += 1
+                self.reply("250 OK")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.latency = latency
+        self.messages = 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+# --- Fake Stripe / Gemini / resume parser ---
+def install_fake_stripe(latency):
+    import stripe
+
+    def create(**kwargs):
+        time.sleep(latency)
+        checkout_id = f"cs_test_{kwargs['metadata']['session_id']}"
+        return types.SimpleNamespace(id=checkout_id, url=f"https://checkout.stripe.test/{checkout_id}")
+
+    def retrieve(checkout_id, **kwargs):
+        time.sleep(latency)
+        return types.SimpleNamespace(id=checkout_id, payment_status='paid')
+
+    stripe.checkout.Session.create = create
+    stripe.checkout.Session.retrieve = retrieve
+
+
+def install_fake_gemini(latency):
+    try:
+        import gemini_helper
+        from gemini_client import FakeModel
+    except ImportError:
+        return False
+    gemini_helper._model = FakeModel(latency=latency)
+    return True
+
+
+RESUME_LATENCY = 0.0
+
+def fake_analyze_resume(filepath, goal=None):
+    time.sleep(RESUME_LATENCY)
+    return {'skills': ['Python', 'SQL'], 'missing_skills': ['Git'], 'score': 20, 'experience': 1,
+            'parse_seconds': RESUME_LATENCY}
+
+
+def load_app(args, workdir):
+    """Build the app against the fakes"""
+    global RESUME_LATENCY
+    smtp = FakeSMTPServer(args.smtp_latency).start()
+    os.environ.update({
+        'DATA_BACKEND': 'memory',
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': str(smtp.server_address[1]),
+        'MAIL_USE_TLS': '0',
+        'REMINDER_DB': os.path.join(workdir, 'reminders.db'),
+        'RESUME_CACHE_DB': os.path.join(workdir, 'resume_cache.db'),
+        'OUTBOX_DB': os.path.join(workdir, 'outbox.db'),
+        'SESSION_DB': os.path.join(workdir, 'sessions.db'),
+    })
+    os.chdir(workdir)
+    import resume_jobs
+    RESUME_LATENCY = args.resume_latency
+    resume_jobs.analyze_resume = fake_analyze_resume
+
+    from app import create_app
+    from repositories import Repositories, MemoryBackend, TimedBackend
+    # Journeys run in-process with no thread pool to protect, so admission
+    # control only applies to --overload. Overload clients each send their
+    # own X-Forwarded-For, as if behind a proxy
+    config = {'TRUSTED_PROXIES': 1} if args.overload else {}
+    if not args.overload or args.no_admission:
+        config['ADMISSION'] = {}
+    app = create_app(config)
+    services = app.extensions['services']
+    services.repos = Repositories(TimedBackend(LatencyBackend(MemoryBackend(), args.db_latency), 'firestore'))
+    install_fake_stripe(args.stripe_latency)
+    install_fake_gemini(args.gemini_latency)
+    return app, smtp
+
+
+# --- Journeys ---
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, elapsed, status, expected=(200, 302)):
+        with self._lock:
+            self.samples.setdefault(route, []).append(elapsed)
+            counts = self.statuses.setdefault(route, {})
+            counts[status] = counts.get(status, 0) + 1
+            if status not in expected:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def timed(self, route, call, expected=(200, 302)):
+        start = time.perf_counter()
+        response = call()
+        self.record(route, time.perf_counter() - start, response.status_code, expected)
+        return response
+
+
+def journey(app, recorder, n, unique_resumes):
+    from mentor_summary import get_summary
+    student = app.test_client()
+    mentor = app.test_client()
+    mentor_email = f"mentor{n}@loadtest.local"
+    student_email = f"student{n}@loadtest.local"
+
+    recorder.timed('mentor_register', lambda: mentor.post('/mentor-register', data={
+        'name': f"Mentor {n}", 'email': mentor_email, 'current_role': 'Data Scientist',
+        'hourly_charge': '50', 'notification_method': 'email', 'upi_id': f"mentor{n % 10}@upi",
+        'skills': ['Python', 'SQL'], 'availability': ['Mon', 'Wed'],
+    }))
+
+    resume = RESUME_PDF + (str(n).encode() if unique_resumes else b'')
+    recorder.timed('student_form', lambda: student.post('/', data={
+        'name': f"Student {n}", 'email': student_email, 'education': '2nd Year',
+        'goal': 'Data Scientist', 'interests': 'Data Science', 'skills': ['Python', 'SQL'],
+        'resume': (io.BytesIO(resume), 'resume.pdf'),
+    }, content_type='multipart/form-data'))
+
+    recorder.timed('dashboard', lambda: student.get('/dashboard'))
+    recorder.timed('request_session', lambda: student.post('/request-session', data={
+        'mentor_email': mentor_email, 'date': '2031-01-01T10:00', 'duration': '60', 'topics': 'Career',
+    }))
+
+    pending = get_summary(app.extensions['services'].repos, mentor_email)['pending']
+    if not pending:
+        return
+    session_id = pending[0]['id']
+    recorder.timed('accept_session', lambda: mentor.get(f"/accept-session/{session_id}"))
+    recorder.timed('payment_success', lambda: student.get(f"/payment-success/{session_id}"))
+    recorder.timed('mentor_dashboard', lambda: mentor.get('/mentor-dashboard'))
+
+
+# --- Overload ---
+def serve(app, threads):
+    """Serve app over HTTP on a fixed pool of threads, like one gunicorn gthread worker"""
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    class PooledServer(BaseWSGIServer):
+        def __init__(self):
+            super().__init__('127.0.0.1', 0, app, handler=QuietHandler)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            # Connections wait in the pool's queue while every thread is busy
+            self.pool.submit(self.handle_pooled, request, client_address)
+
+        def handle_pooled(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = PooledServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def sign_up(http, base, n, resume=None):
+    files = {'resume': ('resume.pdf', resume)} if resume else None
+    return http.post(f"{base}/", data={
+        'name': f"Student {n}", 'email': f"student{n}@loadtest.local", 'education': '2nd Year',
+        'goal': 'Data Scientist', 'interests': 'Data Science', 'skills': ['Python', 'SQL'],
+    }, files=files, allow_redirects=False)
+
+
+def overload(app, args):
+    """Time cheap routes alone, then under a flood of uploads and AI streams"""
+    import requests
+    server = serve(app, args.server_threads)
+    base = f"http://127.0.0.1:{server.server_port}"
+    expected = (200, 302, 429, 503)
+
+    def session_from(address):
+        http = requests.Session()
+        http.headers['X-Forwarded-For'] = address
+        return http
+
+    def client(n):
+        # A signed-up student on their own address
+        http = session_from(f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}")
+        sign_up(http, base, n)
+        return http
+
+    probes = [client(n) for n in range(args.probes)]
+    # One signed-in student per streaming worker, so each has its own rate limit
+    streamers = {w: client(10000 + w) for w in range(1, args.flood, 2)}
+
+    def probe(http, recorder, deadline):
+        while time.monotonic() < deadline:
+            recorder.timed('dashboard', lambda: http.get(f"{base}/dashboard", allow_redirects=False))
+            recorder.timed('mentor_search', lambda: http.get(f"{base}/mentors/search?skill=Python"))
+
+    def flood_uploads(worker, recorder, deadline):
+        n = 0
+        while time.monotonic() < deadline:
+            n += 1
+            resume = RESUME_PDF + f"{worker}-{n}".encode()
+            # Each upload is a new anonymous signup from this worker's address
+            http = session_from(f"172.16.{worker % 256}.1")
+            start = time.perf_counter()
+            status = sign_up(http, base, 20000 + worker * 100000 + n, resume).status_code
+            route = 'student_form' if status in (200, 302) else f"student_form {status}"
+            recorder.record(route, time.perf_counter() - start, status, expected)
+            if status in (429, 503):
+                time.sleep(0.05)
+
+    def flood_streams(worker, recorder, deadline):
+        http, n = streamers[worker], 0
+        while time.monotonic() < deadline:
+            n += 1
+            start = time.perf_counter()
+            response = http.get(f"{base}/mock-interview/stream?role=role{worker}-{n}")
+            status = response.status_code
+            route = 'mock_interview' if status == 200 else f"mock_interview {status}"
+            recorder.record(route, time.perf_counter() - start, status, expected)
+            if status in (429, 503):
+                time.sleep(0.05)
+
+    phases = {}
+    for phase, flood in (('cheap routes alone', 0), ('under flood', args.flood)):
+        recorder = Recorder()
+        deadline = time.monotonic() + args.duration
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.probes + flood) as pool:
+            futures = [pool.submit(probe, http, recorder, deadline) for http in probes]
+            futures += [pool.submit(flood_uploads if w % 2 == 0 else flood_streams, w, recorder, deadline)
+                        for w in range(flood)]
+            for future in futures:
+                future.result()
+        phases[phase] = summarize(recorder, time.perf_counter() - start)
+        print(f"\n{phase} ({args.server_threads} server threads, {flood} flooding clients):")
+        print_report(*phases[phase])
+
+    import metrics
+    print()
+    for line in metrics.registry.render().splitlines():
+        if line.startswith(('admission_rejected_total', 'admission{')):
+            print(line)
+    server.shutdown()
+    return phases
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    for route, samples in recorder.samples.items():
+        routes[route] = {
+            'count': len(samples),
+            'errors': recorder.errors.get(route, 0),
+            'p50_ms': round(percentile(samples, 50) * 1000, 2),
+            'p95_ms': round(percentile(samples, 95) * 1000, 2),
+            'p99_ms': round(percentile(samples, 99) * 1000, 2),
+            'mean_ms': round(sum(samples) / len(samples) * 1000, 2),
+            'rps': round(len(samples) / elapsed, 1),
+        }
+    total = sum(r['count'] for r in routes.values())
+    return routes, {'requests': total, 'elapsed_s': round(elapsed, 3), 'rps': round(total / elapsed, 1)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+
+def print_report(routes, totals, baseline=None):
+    print(f"{'route':<18}{'count':>7}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>8}")
+    for route, r in routes.items():
+        line = (f"{route:<18}{r['count']:>7}{r['errors']:>5}{r['p50_ms']:>9.1f}"
+                f"{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['rps']:>8.1f}")
+        if baseline and route in baseline['routes']:
+            before = baseline['routes'][route]['p95_ms']
+            if before:
+                line += f"   p95 {100 * (r['p95_ms'] - before) / before:+.0f}%"
+        print(line)
+    print(f"total: {totals['requests']} requests in {totals['elapsed_s']}s ({totals['rps']} req/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--users', type=int, default=100, help="journeys to run")
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--db-latency', type=float, default=0.005, help="seconds per Firestore call")
+    parser.add_argument('--stripe-latency', type=float, default=0.3)
+    parser.add_argument('--smtp-latency', type=float, default=0.2)
+    parser.add_argument('--gemini-latency', type=float, default=1.0)
+    parser.add_argument('--resume-latency', type=float, default=2.0, help="seconds per resume parse")
+    parser.add_argument('--unique-resumes', action='store_true', help="defeat the resume cache")
+    parser.add_argument('--out', help="write results JSON here")
+    parser.add_argument('--compare', help="baseline results JSON to diff p95 against")
+    parser.add_argument('--overload', action='store_true', help="flood expensive routes, time cheap ones")
+    parser.add_argument('--server-threads', type=int, default=8, help="--overload: request threads")
+    parser.add_argument('--flood', type=int, default=24, help="--overload: clients hitting expensive routes")
+    parser.add_argument('--probes', type=int, default=2, help="--overload: clients timing cheap routes")
+    parser.add_argument('--duration', type=float, default=10, help="--overload: seconds per phase")
+    parser.add_argument('--no-admission', action='store_true', help="--overload: disable admission control")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    out = os.path.abspath(args.out) if args.out else None
+    revision = git_revision()
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    app, smtp = load_app(args, workdir)
+
+    if args.overload:
+        phases = overload(app, args)
+        if out:
+            with open(out, 'w') as f:
+                json.dump({'revision': revision, 'config': vars(args),
+                           'phases': {p: {'totals': t, 'routes': r} for p, (r, t) in phases.items()}},
+                          f, indent=2)
+        return
+
+    recorder = Recorder()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for future in [pool.submit(journey, app, recorder, n, args.unique_resumes)
+                       for n in range(args.users)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    routes, totals = summarize(recorder, elapsed)
+    print_report(routes, totals, baseline)
+
+    if out:
+        result = {
+            'revision': revision,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'config': vars(args),
+            'totals': totals,
+            'routes': routes,
+            'emails_delivered': smtp.messages,
+        }
+        with open(out, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
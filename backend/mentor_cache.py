@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+MENTOR_CACHE_TTL = int(os.getenv('MENTOR_CACHE_TTL', 300))
+# Seconds between checks of the mentors' version stamp
+MENTOR_CACHE_CHECK = float(os.getenv('MENTOR_CACHE_CHECK', 5))
+
+
+class MentorCache:
+    """Read-through cache of mentor documents plus the active-mentor list.
+
+    Entries expire after `ttl` seconds; mentor_register calls put() so a
+    mentor's own changes are visible immediately in this process. Writes
+    from other processes move the mentors' version stamp, which is checked
+    at most every `check_interval` seconds and empties the cache when it
+    moved. Misses aren't cached, so a new mentor is found straight away.
+    """
+
+    def __init__(self, mentors, ttl=MENTOR_CACHE_TTL, active_limit=5, check_interval=MENTOR_CACHE_CHECK):
+        self.mentors = mentors
+        self.ttl = ttl
+        self.active_limit = active_limit
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._mentors = {}
+        self._active = None
+        self._active_expires = 0
+        self._version = None
+        self._checked = 0
+        self._lock = threading.Lock()
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        self._checked = now
+        version = self.mentors.version()
+        if version != self._version:
+            self._version = version
+            self.invalidate()
+
+    def get(self, email):
+        """Mentor dict for email, or None if no such mentor"""
+        self._check_version()
+        now = time.time()
+        with self._lock:
+            entry = self._mentors.get(email)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+        self.misses += 1
+        mentor = self.mentors.get(email)
+        if mentor is not None:
+            with self._lock:
+                self._mentors[email] = (mentor, now + self.ttl)
+        return mentor
+
+    def put(self, mentor):
+        with self._lock:
+            self._mentors[mentor['email']] = (mentor, time.time() + self.ttl)
+            self._active = None
+
+    def invalidate(self, email=None):
+        with self._lock:
+            if email is None:
+                self._mentors.clear()
+            else:
+                self._mentors.pop(email, None)
+            self._active = None
+
+    def active_mentors(self):
+        """Precomputed active-mentor list shown on the student dashboard"""
+        self._check_version()
+        now = time.time()
+        with self._lock:
+            if self._active is not None and self._active_expires > now:
+                return self._active
+        active = self.mentors.active(limit=self.active_limit)
+        with self._lock:
+            self._active = active
+            self._active_expires = now + self.ttl
+            for mentor in active:
+                self._mentors[mentor['email']] = (mentor, now + self.ttl)
+        return active
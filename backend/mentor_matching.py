@@ -0,0 +1,217 @@
+import os
+import re
+import threading
+import time
+import numpy as np
+
+ROLE_WEIGHT = 0.5
+UNAVAILABLE_PENALTY = 0.5
+# Seconds between checks of the mentors' version stamp
+RELOAD_INTERVAL = float(os.getenv('MENTOR_INDEX_RELOAD', 10))
+# Seconds between full rebuilds, which also drop deleted mentors
+REBUILD_INTERVAL = float(os.getenv('MENTOR_INDEX_REBUILD', 3600))
+# Changes are fetched from this many seconds before the last check, in
+# case writers' clocks disagree; re-applying a change is harmless
+CLOCK_SKEW = 60
+
+
+def normalize_skill(skill):
+    return skill.strip().casefold()
+
+
+def role_terms(text):
+    return {f"role:{t}" for t in re.findall(r'[a-z0-9+#]+', (text or '').casefold()) if len(t) > 2}
+
+
+class MentorIndex:
+    """In-memory skill-incidence matrix over active mentors.
+
+    Each row is a mentor, each column a skill (or a `role:` word from
+    current_role). Matching a student is one matrix-vector product, and
+    upsert/remove touch a single row so mentor_register can keep it current.
+    """
+
+    def __init__(self, capacity=1024, columns=128):
+        self._lock = threading.RLock()
+        self._columns = {}
+        self._matrix = np.zeros((capacity, columns), dtype=np.float32)
+        self._available = np.zeros(capacity, dtype=bool)
+        self._used = np.zeros(capacity, dtype=bool)
+        self._price = np.zeros(capacity, dtype=np.float32)
+        self._rows = {}
+        self._mentors = [None] * capacity
+        self._free = []
+        self._size = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _column(self, term):
+        col = self._columns.get(term)
+        if col is None:
+            col = len(self._columns)
+            self._columns[term] = col
+            if col >= self._matrix.shape[1]:
+                self._matrix = np.pad(self._matrix, ((0, 0), (0, self._matrix.shape[1])))
+        return col
+
+    def _allocate_row(self):
+        if self._free:
+            return self._free.pop()
+        if self._size >= self._matrix.shape[0]:
+            grow = self._matrix.shape[0]
+            self._matrix = np.pad(self._matrix, ((0, grow), (0, 0)))
+            self._available = np.pad(self._available, (0, grow))
+            self._used = np.pad(self._used, (0, grow))
+            self._price = np.pad(self._price, (0, grow))
+            self._mentors.extend([None] * grow)
+        self._size += 1
+        return self._size - 1
+
+    def upsert(self, mentor):
+        """Add or refresh a mentor; inactive mentors are dropped from the index"""
+        if mentor.get('status', 'active') != 'active':
+            self.remove(mentor['email'])
+            return
+        terms = {normalize_skill(s) for s in mentor.get('skills', []) if s.strip()}
+        terms |= role_terms(mentor.get('current_role'))
+        with self._lock:
+            row = self._rows.get(mentor['email'])
+            if row is None:
+                row = self._allocate_row()
+                self._rows[mentor['email']] = row
+            self._matrix[row] = 0
+            for term in terms:
+                col = self._column(term)
+                self._matrix[row, col] = ROLE_WEIGHT if term.startswith('role:') else 1
+            self._available[row] = bool(mentor.get('availability'))
+            self._used[row] = True
+            self._price[row] = float(mentor.get('hourly_charge') or 0)
+            self._mentors[row] = {
+                'email': mentor['email'],
+                'name': mentor.get('name'),
+                'current_role': mentor.get('current_role'),
+                'hourly_charge': mentor.get('hourly_charge'),
+                'availability': mentor.get('availability', []),
+                'skills': mentor.get('skills', []),
+            }
+
+    def remove(self, email):
+        with self._lock:
+            row = self._rows.pop(email, None)
+            if row is not None:
+                self._matrix[row] = 0
+                self._used[row] = False
+                self._mentors[row] = None
+                self._free.append(row)
+
+    def load(self, mentors):
+        for mentor in mentors:
+            self.upsert(mentor)
+        return self
+
+    def match(self, skills, goal, k=5):
+        """Top-k mentors for a student as [{'mentor', 'score', 'reasons'}]"""
+        with self._lock:
+            if not self._rows:
+                return []
+            wanted = {normalize_skill(s) for s in skills if s.strip()} | role_terms(goal)
+            cols = [self._columns[t] for t in wanted if t in self._columns]
+            n = self._size
+            if cols:
+                scores = self._matrix[:n, cols].sum(axis=1)
+            else:
+                scores = np.zeros(n, dtype=np.float32)
+            scores = scores / max(len(wanted), 1)
+            scores = np.where(self._available[:n], scores, scores * UNAVAILABLE_PENALTY)
+            # Cheaper mentors win ties
+            max_price = self._price[:n].max() or 1
+            scores = scores - 0.001 * self._price[:n] / max_price
+            scores = np.where(self._used[:n], scores, -np.inf)
+
+            k = min(k, len(self._rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [self._explain(int(row), float(scores[row]), skills, goal) for row in top]
+
+    def _explain(self, row, score, skills, goal):
+        mentor = self._mentors[row]
+        mentor_skills = {normalize_skill(s): s for s in mentor['skills']}
+        shared = [mentor_skills[normalize_skill(s)] for s in skills if normalize_skill(s) in mentor_skills]
+        reasons = []
+        if shared:
+            reasons.append(f"Shares skills: {', '.join(shared)}")
+        if role_terms(goal) & role_terms(mentor['current_role']):
+            reasons.append(f"Works as {mentor['current_role']}, relevant to {goal}")
+        if mentor['availability']:
+            reasons.append(f"Available {', '.join(mentor['availability'])}")
+        return {'mentor': mentor, 'score': round(max(score, 0.0), 3), 'reasons': reasons}
+
+
+class ReloadingIndex:
+    """An index over active mentors that follows writes from other processes.
+
+    upsert() only updates this process's copy, so a mentor registered in
+    another gunicorn worker, or written by a bulk import, would otherwise
+    be missing here until a restart. A background thread reads the mentors'
+    version stamp (one document) every `interval` seconds; if it moved, only
+    the mentors written since the last check (by updated_at, with a margin
+    for clock skew) are fetched and upserted. Deleted documents and writes
+    that bypass the repo aren't seen that way, so every `rebuild_interval`
+    seconds the thread builds a fresh index and swaps it in. Requests only
+    ever read the current index.
+    """
+
+    def __init__(self, factory, mentors, interval=RELOAD_INTERVAL, rebuild_interval=REBUILD_INTERVAL):
+        self.factory = factory
+        self.mentors = mentors
+        self.interval = interval
+        self.rebuild_interval = rebuild_interval
+        self.refreshes = 0
+        self.rebuilds = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        self._rebuild()
+
+    def _rebuild(self):
+        # Stamp and time first: a write that lands during the load is applied again later
+        version, since = self.mentors.version(), time.time()
+        self.index = self.factory().load(self.mentors.active())
+        self._version, self._since = version, since
+        self._built = time.monotonic()
+
+    def _refresh(self):
+        version, since = self.mentors.version(), time.time()
+        if version == self._version:
+            return
+        for mentor in self.mentors.changed_since(self._since - CLOCK_SKEW):
+            self.index.upsert(mentor)
+        self._version, self._since = version, since
+        self.refreshes += 1
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                if time.monotonic() - self._built >= self.rebuild_interval:
+                    self._rebuild()
+                    self.rebuilds += 1
+                else:
+                    self._refresh()
+            except Exception as e:
+                print(f"Mentor index refresh failed: {str(e)}")
+
+    def current(self):
+        # Started on first use, so it runs in the worker process, not a pre-fork master
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='mentor-index-refresh', daemon=True)
+                    self._thread.start()
+        return self.index
+
+    def __len__(self):
+        return len(self.current())
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
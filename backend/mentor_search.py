@@ -0,0 +1,145 @@
+import base64
+import json
+import threading
+from bisect import bisect_left, bisect_right, insort
+from mentor_matching import normalize_skill, role_terms
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Walk the price list when the filters match at least this share of it,
+# otherwise sort the (smaller) filtered set instead
+WALK_RATIO = 0.05
+LAST_EMAIL = chr(0x10FFFF)  # sorts after any email at the same price
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(price, email) after which the next page starts; ValueError if malformed"""
+    try:
+        price, email = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return float(price), str(email)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class MentorSearchIndex:
+    """Inverted index over active mentors' skills, role words and availability.
+
+    Postings map each term to the set of mentor emails that have it, and
+    every mentor also sits in one list sorted by (hourly_charge, email).
+    A search intersects the postings for its filters, then either walks the
+    price list from the cursor or sorts the matches, whichever touches fewer
+    entries. upsert/remove only touch that mentor's entries, so
+    mentor_register, and ReloadingIndex applying other processes'
+    changes, keep the index current without a rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._terms = {}
+        self._keys = {}
+        self._by_price = []
+        self._mentors = {}
+
+    def __len__(self):
+        return len(self._mentors)
+
+    @staticmethod
+    def _terms_for(mentor):
+        terms = {f"skill:{normalize_skill(s)}" for s in mentor.get('skills', []) if s.strip()}
+        terms |= role_terms(mentor.get('current_role'))
+        terms |= {f"avail:{a}" for a in mentor.get('availability', [])}
+        return terms
+
+    def upsert(self, mentor):
+        """Add or refresh a mentor; inactive mentors are dropped from the index"""
+        if mentor.get('status', 'active') != 'active':
+            self.remove(mentor['email'])
+            return
+        email = mentor['email']
+        with self._lock:
+            self.remove(email)
+            terms = self._terms_for(mentor)
+            for term in terms:
+                self._postings.setdefault(term, set()).add(email)
+            key = (float(mentor.get('hourly_charge') or 0), email)
+            insort(self._by_price, key)
+            self._terms[email] = terms
+            self._keys[email] = key
+            self._mentors[email] = {
+                'email': email,
+                'name': mentor.get('name'),
+                'current_role': mentor.get('current_role'),
+                'hourly_charge': mentor.get('hourly_charge'),
+                'availability': mentor.get('availability', []),
+                'skills': mentor.get('skills', []),
+            }
+
+    def remove(self, email):
+        with self._lock:
+            key = self._keys.pop(email, None)
+            if key is None:
+                return
+            del self._by_price[bisect_left(self._by_price, key)]
+            for term in self._terms.pop(email):
+                postings = self._postings[term]
+                postings.discard(email)
+                if not postings:
+                    del self._postings[term]
+            del self._mentors[email]
+
+    def load(self, mentors):
+        for mentor in mentors:
+            self.upsert(mentor)
+        return self
+
+    def _matching(self, skills, role, availability):
+        """Emails passing every filter, or None when there are no filters"""
+        required = [f"skill:{normalize_skill(s)}" for s in skills if s.strip()]
+        required += sorted(role_terms(role))
+        groups = [self._postings.get(t, set()) for t in required]
+        if availability:
+            groups.append(set().union(*(self._postings.get(f"avail:{a}", set()) for a in availability)))
+        if not groups:
+            return None
+        groups.sort(key=len)
+        return groups[0].intersection(*groups[1:])
+
+    def search(self, skills=(), role=None, availability=(), min_price=None, max_price=None,
+               cursor=None, limit=PAGE_SIZE):
+        """One page of mentors sorted by price, and the cursor for the next page (or None)"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        low = (float(min_price), '') if min_price is not None else None
+        after = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            matches = self._matching(skills, role, availability)
+            start = 0
+            if low is not None:
+                start = bisect_left(self._by_price, low)
+            if after is not None:
+                start = max(start, bisect_right(self._by_price, after))
+            end = len(self._by_price)
+            if max_price is not None:
+                end = bisect_right(self._by_price, (float(max_price), LAST_EMAIL))
+
+            if matches is None or len(matches) >= WALK_RATIO * (end - start):
+                page = []
+                for i in range(start, end):
+                    key = self._by_price[i]
+                    if matches is None or key[1] in matches:
+                        page.append(key)
+                        if len(page) > limit:
+                            break
+            else:
+                lo = self._by_price[start] if start < end else None
+                hi = self._by_price[end - 1] if start < end else None
+                page = sorted(k for k in (self._keys[e] for e in matches)
+                              if lo is not None and lo <= k <= hi)[:limit + 1]
+
+            next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+            return [self._mentors[email] for _, email in page[:limit]], next_cursor
+
@@ -0,0 +1,180 @@
+"""Per-mentor dashboard summary, kept in step with the sessions collection.
+
+Every session write goes through record_session_change(), which updates
+the session and its mentor's summary document in one transaction, so
+mentor_dashboard is a single document read. Rebuild from scratch with:
+
+    python mentor_summary.py rebuild [mentor_email ...]
+"""
+import sys
+from datetime import datetime
+
+UPCOMING_STATUSES = ('accepted', 'completed')
+# Most entries kept per list (oldest requests, soonest sessions), so a busy
+# mentor's summary document stays small
+LIST_LIMITS = {'pending': 50, 'upcoming': 20}
+# A truncated list is refilled from sessions once it has shrunk to this
+# fraction of its limit, so each rebuild covers many accepts/declines
+REFILL_FRACTION = 0.5
+# Fields copied into the summary entries the dashboard renders
+ENTRY_FIELDS = ('student_email', 'student_name', 'date', 'duration', 'topics',
+                'status', 'payment_status', 'payment_link', 'amount', 'created_at')
+
+
+def empty_summary(mentor_email):
+    return {
+        'mentor_email': mentor_email,
+        'pending': [],
+        'upcoming': [],
+        'counts': {},
+        'earnings': 0.0,
+        'truncated': [],
+        'updated_at': None,
+        'revision': 0,
+    }
+
+
+def _entry(session_id, data):
+    entry = {f: data.get(f) for f in ENTRY_FIELDS}
+    entry['id'] = session_id
+    return entry
+
+
+def apply_session(summary, session_id, old, new, now=None):
+    """Swap a session's old contribution to the summary for its new one"""
+    now = now or datetime.now().isoformat()
+    summary['pending'] = [e for e in summary['pending'] if e['id'] != session_id]
+    summary['upcoming'] = [e for e in summary['upcoming']
+                           if e['id'] != session_id and (e.get('date') or '') >= now]
+    counts = summary['counts']
+
+    for data, sign in ((old, -1), (new, 1)):
+        if not data:
+            continue
+        status = data.get('status')
+        counts[status] = max(counts.get(status, 0) + sign, 0)
+        if data.get('payment_status') == 'completed':
+            summary['earnings'] = round(summary['earnings'] + sign * (data.get('amount') or 0), 2)
+
+    if new:
+        if new.get('status') == 'pending':
+            summary['pending'].append(_entry(session_id, new))
+            summary['pending'].sort(key=lambda e: e.get('created_at') or '')
+        elif new.get('status') in UPCOMING_STATUSES and (new.get('date') or '') >= now:
+            summary['upcoming'].append(_entry(session_id, new))
+            summary['upcoming'].sort(key=lambda e: e.get('date') or '')
+
+    for name, limit in LIST_LIMITS.items():
+        if len(summary[name]) > limit:
+            del summary[name][limit:]
+            if name not in summary.setdefault('truncated', []):
+                summary['truncated'].append(name)
+
+    summary['updated_at'] = now
+    # Lets rebuild_summary detect a change that landed while it was reading
+    summary['revision'] = summary.get('revision', 0) + 1
+    return summary
+
+
+def record_session_change(repos, session_id, changes, from_status=None):
+    """Create or update a session and its mentor summary atomically.
+
+    `changes` is merged into the existing session (or becomes the new
+    session); it must include mentor_email when creating one. With
+    from_status (a tuple of statuses), nothing is written unless the session
+    is still in one of them, and None is returned.
+    """
+    mentor_email = changes.get('mentor_email')
+    if mentor_email is None:
+        existing = repos.sessions.get(session_id)
+        if existing is None:
+            raise KeyError(f"sessions/{session_id} does not exist")
+        mentor_email = existing['mentor_email']
+
+    def update(docs):
+        old, summary = docs
+        if from_status is not None and (old or {}).get('status') not in from_status:
+            return [None, None]
+        new = dict(old or {}, **changes)
+        summary = apply_session(summary or empty_summary(mentor_email), session_id, old, new)
+        return [new, summary]
+
+    new, _ = repos.transact([(repos.sessions, session_id),
+                             (repos.mentor_summaries, mentor_email)], update)
+    return new
+
+
+def rebuild_summary(repos, mentor_email):
+    """Recompute one mentor's summary from their sessions.
+
+    Sessions are read outside the transaction, so the rebuilt summary is only
+    written if no record_session_change() bumped the stored revision in the
+    meantime; otherwise the concurrently updated summary is kept and returned.
+    """
+    stored = repos.mentor_summaries.get(mentor_email)
+    revision = (stored or {}).get('revision', 0)
+    summary = empty_summary(mentor_email)
+    for session_id, data in repos.sessions.query_items([('mentor_email', '==', mentor_email)]):
+        apply_session(summary, session_id, None, data)
+    summary['revision'] = revision + 1
+    result = {}
+
+    def write(docs):
+        current, = docs
+        if current is not None and current.get('revision', 0) != revision:
+            result['summary'] = current
+            return [None]
+        result['summary'] = summary
+        return [summary]
+
+    repos.transact([(repos.mentor_summaries, mentor_email)], write)
+    return result['summary']
+
+
+def rebuild_all(repos):
+    """Recompute every mentor's summary in one pass over sessions"""
+    summaries = {}
+    for session_id, data in repos.sessions.stream():
+        email = data.get('mentor_email')
+        if email:
+            summary = summaries.setdefault(email, empty_summary(email))
+            apply_session(summary, session_id, None, data)
+    for email, _ in repos.mentors.stream():
+        summaries.setdefault(email, empty_summary(email))
+    with repos.batch() as batch:
+        for email, summary in summaries.items():
+            batch.set(repos.mentor_summaries, email, summary)
+    return len(summaries)
+
+
+def get_summary(repos, mentor_email):
+    """Summary document, building it on first access; stale upcoming entries dropped.
+
+    A list that was cut at its limit may be missing sessions, so once it has
+    shrunk to REFILL_FRACTION of the limit the summary is rebuilt to refill it.
+    """
+    summary = repos.mentor_summaries.get(mentor_email)
+    if summary is None:
+        summary = rebuild_summary(repos, mentor_email)
+    now = datetime.now().isoformat()
+    summary['upcoming'] = [e for e in summary['upcoming'] if (e.get('date') or '') >= now]
+    if any(len(summary[name]) <= LIST_LIMITS[name] * REFILL_FRACTION
+           for name in summary.get('truncated', [])):
+        summary = rebuild_summary(repos, mentor_email)
+        summary['upcoming'] = [e for e in summary['upcoming'] if (e.get('date') or '') >= now]
+    return summary
+
+
+if __name__ == '__main__':
+    from repositories import Repositories, backend_from_env
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'rebuild':
+        print(__doc__)
+        sys.exit(1)
+    repos = Repositories(backend_from_env())
+    if len(sys.argv) > 2:
+        for email in sys.argv[2:]:
+            rebuild_summary(repos, email)
+            print(f"Rebuilt summary for {email}")
+    else:
+        print(f"Rebuilt {rebuild_all(repos)} mentor summaries")
@@ -0,0 +1,161 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0))  # 0 disables the slow-request log
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms and counters keyed by (name, labels), plus gauges read at scrape time"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.help = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def gauge(self, name, fn, help_text=None):
+        """Register fn() -> number or {label_value: number} to be read on each scrape"""
+        self.gauges[name] = fn
+        if help_text:
+            self.help[name] = help_text
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        seen = set()
+        for (name, labels), h in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(list(h.buckets) + ['+Inf'], h.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {h.sum}")
+            lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for name, fn in sorted(self.gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for label, v in sorted(value.items()):
+                    lines.append(f"{name}{_labels((('kind', label),))} {v}")
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+registry = Registry()
+_local = threading.local()
+
+
+@contextmanager
+def span(dependency, operation):
+    """Time a call to an external dependency; attached to the current request if any"""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe('dependency_duration_seconds', elapsed,
+                         dependency=dependency, operation=operation)
+        if error:
+            registry.inc('dependency_errors_total', dependency=dependency, operation=operation)
+        spans = getattr(_local, 'spans', None)
+        if spans is not None:
+            spans.append((dependency, operation, elapsed))
+
+
+def timed(dependency, operation=None):
+    """Decorator form of span()"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(dependency, operation or f.__name__):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_app(app, slow_ms=SLOW_REQUEST_MS):
+    """Per-request timing for every Flask route"""
+    from flask import request
+
+    @app.before_request
+    def start_timer():
+        _local.start = time.perf_counter()
+        _local.spans = []
+
+    @app.after_request
+    def record_request(response):
+        start = getattr(_local, 'start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unknown'
+        registry.observe('http_request_duration_seconds', elapsed,
+                         endpoint=endpoint, method=request.method, status=response.status_code)
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            breakdown = ", ".join(f"{d}.{op}={t * 1000:.1f}ms" for d, op, t in _local.spans)
+            print(f"Slow request: {request.method} {request.path} {elapsed * 1000:.1f}ms [{breakdown}]")
+        _local.start = None
+        _local.spans = None
+        return response
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from metrics import span
+
+# Stripe checkout.session.* events we record, mapped to our payment_status
+WEBHOOK_STATUSES = {
+    'checkout.session.completed': 'completed',
+    'checkout.session.async_payment_succeeded': 'completed',
+    'checkout.session.async_payment_failed': 'failed',
+    'checkout.session.expired': 'expired',
+}
+
+
+_stripe = None
+_stripe_lock = threading.Lock()
+
+
+def get_stripe():
+    """The stripe module, imported and configured on first use"""
+    global _stripe
+    with _stripe_lock:
+        if _stripe is None:
+            import stripe
+            stripe.api_key = os.getenv('STRIPE_KEY')
+            if os.getenv('STRIPE_API_BASE'):
+                stripe.api_base = os.getenv('STRIPE_API_BASE')  # e.g. a local stripe-mock
+            _stripe = stripe
+        return _stripe
+
+
+def checkout_amount(mentor, duration):
+    """Session price in cents"""
+    return int(mentor['hourly_charge'] * (duration / 60) * 100)
+
+
+def get_or_create_checkout(session_id, session_data, mentor, success_url, cancel_url):
+    """Checkout for a mentorship session, created at most once per session.
+
+    A session that already has a checkout keeps it; otherwise Stripe's
+    idempotency key makes retries of the create call return the same
+    checkout instead of a new one.
+    """
+    if session_data.get('payment_id') and session_data.get('payment_link'):
+        return {'id': session_data['payment_id'], 'url': session_data['payment_link'],
+                'amount': session_data.get('amount'), 'created': False}
+
+    amount = checkout_amount(mentor, session_data['duration'])
+    with span('stripe', 'checkout.Session.create'):
+        checkout_session = get_stripe().checkout.Session.create(
+            payment_method_types=['card'],
+            line_items=[{
+                'price_data': {
+                    'currency': 'usd',
+                    'product_data': {
+                        'name': f"Mentorship Session with {mentor['name']}",
+                    },
+                    'unit_amount': amount,
+                },
+                'quantity': 1,
+            }],
+            mode='payment',
+            success_url=success_url,
+            cancel_url=cancel_url,
+            client_reference_id=session_id,
+            metadata={
+                "session_id": session_id,
+                "mentor_email": session_data['mentor_email'],
+                "student_email": session_data['student_email']
+            },
+            idempotency_key=f"checkout-{session_id}-{amount}"
+        )
+    return {'id': checkout_session.id, 'url': checkout_session.url,
+            'amount': amount / 100, 'created': True}
+
+
+def parse_webhook(payload, signature, secret):
+    """Verified Stripe event as a plain dict; raises ValueError / SignatureVerificationError if invalid"""
+    get_stripe().Webhook.construct_event(payload, signature, secret)
+    # StripeObject isn't a dict (no .get), so read the verified payload itself
+    return json.loads(payload)
+
+
+def payment_update_for_event(event):
+    """(session_id, fields to write) for a checkout event, or None to ignore it.
+
+    checkout.session.completed also fires for delayed payment methods
+    before the money arrives (payment_status 'unpaid'); those are recorded
+    when async_payment_succeeded follows. Raises KeyError/TypeError for a
+    malformed event.
+    """
+    status = WEBHOOK_STATUSES.get(event['type'])
+    if status is None:
+        return None
+    checkout_session = event['data']['object']
+    if event['type'] == 'checkout.session.completed' and checkout_session.get('payment_status') != 'paid':
+        return None
+    session_id = (checkout_session.get('metadata') or {}).get('session_id') \
+        or checkout_session.get('client_reference_id')
+    if not session_id:
+        return None
+    return session_id, {
+        'payment_status': status,
+        'payment_id': checkout_session['id'],
+        'payment_event_id': event['id'],
+    }
+
+
+def expire_checkout(payment_id):
+    """Close an unpaid checkout so its link can no longer be paid"""
+    with span('stripe', 'checkout.Session.expire'):
+        get_stripe().checkout.Session.expire(payment_id)
+
+
+def checkout_is_paid(payment_id):
+    """Ask Stripe directly, for when the redirect beats the webhook"""
+    with span('stripe', 'checkout.Session.retrieve'):
+        return get_stripe().checkout.Session.retrieve(payment_id).payment_status == 'paid'
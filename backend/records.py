@@ -0,0 +1,83 @@
+"""Student and mentor documents built from submitted fields.
+
+Shared by the registration routes and the bulk importer so both store the
+same shape. `fields` is anything with get(); list fields use getlist() when
+it exists (Flask forms) and otherwise accept a list or a ';'-separated
+string (CSV/JSONL rows).
+"""
+from datetime import datetime
+from io import BytesIO
+
+LIST_SEPARATOR = ';'
+
+
+def getlist(fields, name):
+    if hasattr(fields, 'getlist'):
+        return fields.getlist(name)
+    value = fields.get(name)
+    if value is None or value == '':
+        return []
+    if isinstance(value, list):
+        return value
+    return [v.strip() for v in str(value).split(LIST_SEPARATOR) if v.strip()]
+
+
+def generate_study_plan(education, goal, skills):
+    plans = {
+        "1st Year": f"Focus on fundamentals: Python, Math. Start exploring {goal}",
+        "2nd Year": f"Build projects using {', '.join(skills)}. Join {goal} communities",
+        "3rd Year": f"Master {goal}-specific tools | LeetCode 3x/week | Mock interviews",
+        "4th Year": "Job prep: Resume polishing, networking, company research",
+        "Final Semester": "Finalize job applications | Practice behavioral interviews"
+    }
+    return plans.get(education, f"Custom plan for {goal}")
+
+
+def student_record(fields, resume_feedback=None, resume_status=None, now=None):
+    if not fields.get('email'):
+        raise KeyError('email')
+    skills = getlist(fields, 'skills')
+    return {
+        'name': fields.get('name'),
+        'email': fields.get('email'),
+        'degree': fields.get('degree'),
+        'education': fields.get('education'),
+        'goal': fields.get('goal'),
+        'interests': fields.get('interests'),
+        'skills': skills,
+        'experience': fields.get('experience'),
+        'resume_feedback': resume_feedback,
+        'resume_status': resume_status,
+        'study_plan': generate_study_plan(fields.get('education'), fields.get('goal'), skills),
+        'join_date': (now or datetime.now()).isoformat()
+    }
+
+
+def mentor_record(fields, payment_qr=None, now=None):
+    return {
+        'name': fields['name'],
+        'email': fields['email'],
+        'current_role': fields['current_role'],
+        'availability': getlist(fields, 'availability'),
+        'hourly_charge': float(fields['hourly_charge']),
+        'notification_method': fields['notification_method'],
+        'zoom_link': fields.get('zoom_link', ''),
+        'payment_qr': payment_qr,
+        'registration_date': (now or datetime.now()).isoformat(),
+        'status': 'active',
+        'skills': getlist(fields, 'skills')
+    }
+
+
+def upi_qr_key(qr_store, upi_id):
+    """Content key of the QR for a UPI ID, generated only the first time"""
+    uri = f"upi://pay?pa={upi_id}"
+    key = qr_store.get_alias(uri)
+    if key is None:
+        import qrcode
+        img = qrcode.make(uri)
+        buffered = BytesIO()
+        img.save(buffered, format="PNG")
+        key = qr_store.put_bytes(buffered.getvalue(), 'png')
+        qr_store.set_alias(uri, key)
+    return key
@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+
+REMINDER_DB = os.getenv('REMINDER_DB', 'reminders.db')
+REMINDER_INTERVAL = timedelta(weeks=1)
+POLL_SECONDS = int(os.getenv('REMINDER_POLL_SECONDS', 60))
+BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', 100))
+
+
+def print_reminder(email):
+    print(f"\nALARM: Weekly reminder sent to {email}")
+
+
+class ReminderService:
+    """One scheduler thread for every student's weekly reminder.
+
+    Reminders live as rows in SQLite (one per email), so re-registering
+    only updates the existing row and nothing is lost on restart.
+    """
+
+    def __init__(self, db_path=REMINDER_DB, send=print_reminder,
+                 poll_seconds=POLL_SECONDS, batch_size=BATCH_SIZE):
+        self.db_path = db_path
+        self.send = send
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.sent = 0
+        self.failed = 0
+        self._scheduler = None
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reminders (
+                    email TEXT PRIMARY KEY,
+                    interval_seconds REAL NOT NULL,
+                    next_due REAL NOT NULL,
+                    last_sent REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS reminders_due ON reminders (next_due)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def schedule(self, email, interval=REMINDER_INTERVAL):
+        """Add a recurring reminder; re-registering the same email keeps its due date"""
+        seconds = interval.total_seconds()
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO reminders (email, interval_seconds, next_due)
+                VALUES (?, ?, ?)
+                ON CONFLICT(email) DO UPDATE SET interval_seconds = excluded.interval_seconds
+            """, (email, seconds, time.time() + seconds))
+
+    def cancel(self, email):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM reminders WHERE email = ?", (email,))
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM reminders").fetchone()[0]
+
+    def dispatch_due(self, now=None):
+        """Send every reminder that is due, batch_size rows at a time.
+
+        Each gunicorn worker runs a dispatcher against the same table, so a
+        batch is claimed before sending: moving next_due on only if it still
+        holds the value that was read. A row another process claimed first
+        no longer matches and is skipped, so each reminder goes out once.
+        """
+        now = time.time() if now is None else now
+        dispatched = 0
+        with self._lock, self._connect() as conn:
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute("""
+                    SELECT email, interval_seconds, next_due FROM reminders
+                    WHERE next_due <= ? ORDER BY next_due LIMIT ?
+                """, (now, self.batch_size)).fetchall()
+                claimed = []
+                for email, interval, next_due in rows:
+                    # Skip missed weeks instead of sending a burst after downtime
+                    due = next_due
+                    while due <= now:
+                        due += interval
+                    cursor = conn.execute("""
+                        UPDATE reminders SET next_due = ?, last_sent = ?
+                        WHERE email = ? AND next_due = ?
+                    """, (due, now, email, next_due))
+                    if cursor.rowcount == 1:
+                        claimed.append(email)
+                conn.commit()
+                if not rows:
+                    break
+
+                for email in claimed:
+                    try:
+                        self.send(email)
+                        self.sent += 1
+                    except Exception as e:
+                        print(f"Reminder failed for {email}: {str(e)}")
+                        self.failed += 1
+                dispatched += len(claimed)
+        return dispatched
+
+    def start(self):
+        if self._scheduler is None:
+            from apscheduler.schedulers.background import BackgroundScheduler
+            self._scheduler = BackgroundScheduler()
+            self._scheduler.add_job(self.dispatch_due, 'interval', seconds=self.poll_seconds,
+                                    id='dispatch_reminders', max_instances=1, coalesce=True)
+            self._scheduler.start()
+        return self
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_reminder_service():
+    """Process-wide reminder service. Scheduling only writes rows; the
+    dispatcher runs once start() is called (Services.start_workers)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ReminderService()
+        return _service
@@ -0,0 +1,461 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from metrics import span
+
+OPS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+    'array_contains': lambda a, b: b in (a or []),
+}
+
+
+def new_document_id():
+    return uuid.uuid4().hex[:20]
+
+
+# --- Backends ---
+class FirestoreBackend:
+    """Thin adapter over a firestore.Client"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def new_id(self, collection):
+        return self.client.collection(collection).document().id
+
+    def get_all(self, keys):
+        """Fetch (collection, id) pairs in one round-trip, in order; missing -> None"""
+        if not keys:
+            return []
+        refs = [self.client.collection(c).document(i) for c, i in keys]
+        found = {doc.reference.path: doc.to_dict() for doc in self.client.get_all(refs)}
+        return [found.get(ref.path) for ref in refs]
+
+    def query_items(self, collection, filters=(), order_by=None, limit=None):
+        """Matching documents as (id, data) pairs"""
+        ref = self.client.collection(collection)
+        for field, op, value in filters:
+            ref = ref.where(field, op, value)
+        if order_by:
+            ref = ref.order_by(order_by)
+        if limit:
+            ref = ref.limit(limit)
+        return [(doc.id, doc.to_dict()) for doc in ref.stream()]
+
+    def stream(self, collection, page_size=500):
+        ref = self.client.collection(collection).order_by('__name__').limit(page_size)
+        last = None
+        while True:
+            docs = list((ref.start_after(last) if last else ref).stream())
+            for doc in docs:
+                yield doc.id, doc.to_dict()
+            if len(docs) < page_size:
+                return
+            last = docs[-1]
+
+    def transact(self, keys, fn):
+        """Atomically read (collection, id) docs, pass them to fn and write back
+        every non-None document fn returns (in the same order)"""
+        from google.cloud.firestore import transactional
+        refs = [self.client.collection(c).document(i) for c, i in keys]
+
+        @transactional
+        def run(transaction):
+            found = {doc.reference.path: doc.to_dict() for doc in transaction.get_all(refs)}
+            docs = fn([found.get(ref.path) for ref in refs])
+            for ref, doc in zip(refs, docs):
+                if doc is not None:
+                    transaction.set(ref, doc)
+            return docs
+
+        return run(self.client.transaction())
+
+    def commit(self, writes):
+        """Apply [(op, collection, id, data)] writes; Firestore caps a batch at 500"""
+        for start in range(0, len(writes), 500):
+            batch = self.client.batch()
+            for op, collection, doc_id, data in writes[start:start + 500]:
+                ref = self.client.collection(collection).document(doc_id)
+                if op == 'set':
+                    batch.set(ref, data)
+                elif op == 'update':
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            batch.commit()
+
+
+class MemoryBackend:
+    """Dict-backed store for running and load-testing without Firebase"""
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def new_id(self, collection):
+        return new_document_id()
+
+    def _docs(self, collection):
+        return self._collections.setdefault(collection, {})
+
+    def get_all(self, keys):
+        with self._lock:
+            return [_copy(self._docs(c).get(i)) for c, i in keys]
+
+    def query_items(self, collection, filters=(), order_by=None, limit=None):
+        with self._lock:
+            items = list(self._docs(collection).items())
+        return [(i, _copy(d)) for i, d in _apply_query(items, filters, order_by, limit)]
+
+    def stream(self, collection, page_size=500):
+        with self._lock:
+            items = sorted(self._docs(collection).items())
+        for doc_id, data in items:
+            yield doc_id, _copy(data)
+
+    def transact(self, keys, fn):
+        with self._lock:
+            docs = fn([_copy(self._docs(c).get(i)) for c, i in keys])
+            for (collection, doc_id), doc in zip(keys, docs):
+                if doc is not None:
+                    self._docs(collection)[doc_id] = _copy(doc)
+            return docs
+
+    def commit(self, writes):
+        with self._lock:
+            for op, collection, doc_id, data in writes:
+                docs = self._docs(collection)
+                if op == 'set':
+                    docs[doc_id] = _copy(data)
+                elif op == 'update':
+                    if doc_id not in docs:
+                        raise KeyError(f"{collection}/{doc_id} does not exist")
+                    docs[doc_id].update(_copy(data))
+                else:
+                    docs.pop(doc_id, None)
+
+
+class SQLiteBackend:
+    """Documents stored as JSON rows; queries are filtered in Python"""
+
+    def __init__(self, db_path='app_data.db'):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    collection TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (collection, id)
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def new_id(self, collection):
+        return new_document_id()
+
+    def get_all(self, keys):
+        if not keys:
+            return []
+        with self._connect() as conn:
+            clause = " OR ".join(["(collection = ? AND id = ?)"] * len(keys))
+            params = [v for key in keys for v in key]
+            rows = conn.execute(f"SELECT collection, id, data FROM documents WHERE {clause}",
+                                params).fetchall()
+        found = {(c, i): json.loads(d) for c, i, d in rows}
+        return [found.get(tuple(key)) for key in keys]
+
+    def query_items(self, collection, filters=(), order_by=None, limit=None):
+        return _apply_query(list(self.stream(collection)), filters, order_by, limit)
+
+    def stream(self, collection, page_size=500):
+        last = ''
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute("""
+                    SELECT id, data FROM documents WHERE collection = ? AND id > ?
+                    ORDER BY id LIMIT ?
+                """, (collection, last, page_size)).fetchall()
+            for doc_id, data in rows:
+                yield doc_id, json.loads(data)
+            if len(rows) < page_size:
+                return
+            last = rows[-1][0]
+
+    def transact(self, keys, fn):
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            current = []
+            for collection, doc_id in keys:
+                row = conn.execute("SELECT data FROM documents WHERE collection = ? AND id = ?",
+                                   (collection, doc_id)).fetchone()
+                current.append(json.loads(row[0]) if row else None)
+            docs = fn(current)
+            for (collection, doc_id), doc in zip(keys, docs):
+                if doc is not None:
+                    conn.execute("INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                                 (collection, doc_id, json.dumps(doc)))
+            return docs
+
+    def commit(self, writes):
+        with self._lock, self._connect() as conn:
+            # Take the write lock before an update's read, so another process
+            # can't change the row between the read and the write
+            conn.execute("BEGIN IMMEDIATE")
+            for op, collection, doc_id, data in writes:
+                if op == 'set':
+                    conn.execute("INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+                                 (collection, doc_id, json.dumps(data)))
+                elif op == 'update':
+                    row = conn.execute("SELECT data FROM documents WHERE collection = ? AND id = ?",
+                                       (collection, doc_id)).fetchone()
+                    if row is None:
+                        raise KeyError(f"{collection}/{doc_id} does not exist")
+                    merged = json.loads(row[0])
+                    merged.update(data)
+                    conn.execute("UPDATE documents SET data = ? WHERE collection = ? AND id = ?",
+                                 (json.dumps(merged), collection, doc_id))
+                else:
+                    conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?",
+                                 (collection, doc_id))
+
+
+class TimedBackend:
+    """Records every backend call as a `dependency` span (see metrics.span)"""
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+
+    def new_id(self, collection):
+        return self.backend.new_id(collection)
+
+    def get_all(self, keys):
+        with span(self.name, 'get_all'):
+            return self.backend.get_all(keys)
+
+    def query_items(self, collection, filters=(), order_by=None, limit=None):
+        with span(self.name, f"query:{collection}"):
+            return self.backend.query_items(collection, filters, order_by, limit)
+
+    def stream(self, collection, page_size=500):
+        with span(self.name, f"stream:{collection}"):
+            yield from self.backend.stream(collection, page_size)
+
+    def transact(self, keys, fn):
+        with span(self.name, 'transact'):
+            return self.backend.transact(keys, fn)
+
+    def commit(self, writes):
+        with span(self.name, 'commit'):
+            return self.backend.commit(writes)
+
+
+def _copy(data):
+    return json.loads(json.dumps(data)) if data is not None else None
+
+
+def _apply_query(items, filters, order_by, limit):
+    for field, op, value in filters:
+        items = [(i, d) for i, d in items if OPS[op](d.get(field), value)]
+    if order_by:
+        items.sort(key=lambda item: (item[1].get(order_by) is None, item[1].get(order_by)))
+    return items[:limit] if limit else items
+
+
+def backend_from_env(kind=None):
+    """Backend named by DATA_BACKEND (firestore, memory or sqlite)"""
+    kind = kind or os.getenv('DATA_BACKEND', 'firestore')
+    if kind == 'firestore':
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS', 'serviceAccountKey.json'))
+            firebase_admin.initialize_app(cred)
+        return TimedBackend(make_backend('firestore', client=firestore.client()), kind)
+    return TimedBackend(make_backend(kind, db_path=os.getenv('DATA_DB', 'app_data.db')), kind)
+
+
+def make_backend(kind, **kwargs):
+    """'firestore' (needs client=), 'memory' or 'sqlite' (optional db_path=)"""
+    if kind == 'firestore':
+        return FirestoreBackend(kwargs['client'])
+    if kind == 'memory':
+        return MemoryBackend()
+    if kind == 'sqlite':
+        return SQLiteBackend(kwargs.get('db_path', 'app_data.db'))
+    raise ValueError(f"Unknown data backend: {kind}")
+
+
+# --- Repositories ---
+VERSIONS = 'versions'
+
+
+def version_write(collection):
+    """Write that gives `collection` a new version stamp in the versions collection"""
+    return ('set', VERSIONS, collection, {'version': uuid.uuid4().hex})
+
+
+def stamped(write):
+    """A set/update that also records when the document changed (updated_at)"""
+    op, collection, doc_id, data = write
+    if op == 'delete':
+        return write
+    return op, collection, doc_id, dict(data, updated_at=time.time())
+
+
+class Repo:
+    collection = None
+    # Versioned collections get a new stamp with every write, and each
+    # written document gets updated_at, so processes holding an in-memory
+    # copy can tell cheaply that something changed and fetch only that
+    versioned = False
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _commit(self, write):
+        writes = [write]
+        if self.versioned:
+            writes = [stamped(write), version_write(self.collection)]
+        self.backend.commit(writes)
+
+    def version(self):
+        """Current version stamp (None until the first write); only kept for versioned repos"""
+        doc = self.backend.get_all([(VERSIONS, self.collection)])[0]
+        return doc and doc['version']
+
+    def new_id(self):
+        return self.backend.new_id(self.collection)
+
+    def get(self, doc_id):
+        return self.backend.get_all([(self.collection, doc_id)])[0]
+
+    def set(self, doc_id, data):
+        self._commit(('set', self.collection, doc_id, data))
+
+    def update(self, doc_id, data):
+        self._commit(('update', self.collection, doc_id, data))
+
+    def delete(self, doc_id):
+        self._commit(('delete', self.collection, doc_id, None))
+
+    def query(self, filters=(), order_by=None, limit=None):
+        return [data for _, data in self.query_items(filters, order_by, limit)]
+
+    def query_items(self, filters=(), order_by=None, limit=None):
+        return self.backend.query_items(self.collection, filters, order_by, limit)
+
+    def stream(self):
+        return self.backend.stream(self.collection)
+
+
+class StudentRepo(Repo):
+    collection = 'students'
+
+    def save(self, student):
+        self.set(student['email'], student)
+
+
+class MentorRepo(Repo):
+    collection = 'mentors'
+    versioned = True
+
+    def save(self, mentor):
+        self.set(mentor['email'], mentor)
+
+    def active(self, limit=None):
+        return self.query([('status', '==', 'active')], limit=limit)
+
+    def changed_since(self, since):
+        """Mentors written at or after `since` (a time.time() value), active or not"""
+        return self.query([('updated_at', '>=', since)])
+
+
+class SessionRepo(Repo):
+    collection = 'sessions'
+
+    def create(self, data):
+        session_id = self.new_id()
+        self.set(session_id, data)
+        return session_id
+
+
+class MentorSummaryRepo(Repo):
+    collection = 'mentor_summaries'
+
+
+class MentorBookingRepo(Repo):
+    collection = 'mentor_bookings'
+
+
+class MentorInsightsRepo(Repo):
+    collection = 'mentor_insights'
+
+
+class WriteBatch:
+    """Collects writes across repos and commits them together"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.writes = []
+        self.versioned = set()
+
+    def _add(self, repo, write):
+        if repo.versioned:
+            write = stamped(write)
+            self.versioned.add(repo.collection)
+        self.writes.append(write)
+
+    def set(self, repo, doc_id, data):
+        self._add(repo, ('set', repo.collection, doc_id, data))
+
+    def update(self, repo, doc_id, data):
+        self._add(repo, ('update', repo.collection, doc_id, data))
+
+    def delete(self, repo, doc_id):
+        self._add(repo, ('delete', repo.collection, doc_id, None))
+
+    def commit(self):
+        if self.writes:
+            self.backend.commit(self.writes + [version_write(c) for c in sorted(self.versioned)])
+        self.writes = []
+        self.versioned = set()
+
+
+class Repositories:
+    def __init__(self, backend):
+        self.backend = backend
+        self.students = StudentRepo(backend)
+        self.mentors = MentorRepo(backend)
+        self.sessions = SessionRepo(backend)
+        self.mentor_summaries = MentorSummaryRepo(backend)
+        self.mentor_bookings = MentorBookingRepo(backend)
+        self.mentor_insights = MentorInsightsRepo(backend)
+
+    def get_all(self, keys):
+        """Batched read across repos: keys are (repo, doc_id) pairs"""
+        return self.backend.get_all([(repo.collection, doc_id) for repo, doc_id in keys])
+
+    def transact(self, keys, fn):
+        """Atomic read-modify-write over (repo, doc_id) pairs; see backend.transact"""
+        return self.backend.transact([(repo.collection, doc_id) for repo, doc_id in keys], fn)
+
+    @contextmanager
+    def batch(self):
+        batch = WriteBatch(self.backend)
+        yield batch
+        batch.commit()
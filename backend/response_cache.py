@@ -0,0 +1,90 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace only; case can change what a prompt asks (names, feedback text)"""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def prompt_key(function, model, prompt):
+    raw = f"{function}|{model}|{normalize_prompt(prompt)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    """LRU of model responses with per-entry expiry.
+
+    When db_path is given, entries are also written to SQLite and
+    reloaded on a memory miss, so they survive restarts.
+    """
+
+    def __init__(self, max_entries=1000, db_path=None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if db_path:
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires REAL NOT NULL
+                    )
+                """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.db_path:
+                with self._connect() as conn:
+                    row = conn.execute("SELECT value, expires FROM responses WHERE key = ?",
+                                       (key,)).fetchone()
+                if row:
+                    entry = (json.loads(row[0]), row[1])
+                    self._store(key, entry)
+            if entry is None or entry[1] < now:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl):
+        entry = (value, time.time() + ttl)
+        with self._lock:
+            self._store(key, entry)
+            if self.db_path:
+                with self._connect() as conn:
+                    conn.execute("INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)",
+                                 (key, json.dumps(value), entry[1]))
+                    conn.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.db_path:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
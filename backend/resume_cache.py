@@ -0,0 +1,84 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+RESUME_CACHE_DB = os.getenv('RESUME_CACHE_DB', 'resume_cache.db')
+RESUME_CACHE_MAX_BYTES = int(os.getenv('RESUME_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+
+
+def cache_key(content_hash, parser_version):
+    return f"{content_hash}:{parser_version}"
+
+
+class ResumeCache:
+    """On-disk LRU of resume analysis results keyed by content hash + parser version"""
+
+    def __init__(self, db_path=RESUME_CACHE_DB, max_bytes=RESUME_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS resume_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS resume_cache_lru ON resume_cache (last_access)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, key):
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value FROM resume_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE resume_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, value):
+        payload = json.dumps(value)
+        with self._lock, self._connect() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO resume_cache (key, value, size, last_access)
+                VALUES (?, ?, ?, ?)
+            """, (key, payload, len(payload), time.time()))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM resume_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+                "SELECT key, size FROM resume_cache ORDER BY last_access").fetchall():
+            conn.execute("DELETE FROM resume_cache WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM resume_cache").fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries, 'bytes': size}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_resume_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResumeCache()
+        return _cache
@@ -0,0 +1,255 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from content_store import etag_for
+from metrics import registry
+
+# 'skills' (taxonomy matcher, default) or 'pyresparser' (full spaCy pipeline)
+RESUME_PARSER = os.getenv('RESUME_PARSER', 'skills')
+PARSER_VERSION = {'skills': 'skills-1', 'pyresparser': 'pyresparser-1'}[RESUME_PARSER]
+# Finished jobs nobody polled for are dropped after this many seconds
+JOB_TTL = int(os.getenv('RESUME_JOB_TTL', 3600))
+# A student still 'queued' after this many seconds lost their job with a
+# restarted worker, and is queued again
+RESUME_STALE_SECONDS = int(os.getenv('RESUME_STALE_SECONDS', 600))
+
+
+def scoring_goal(interest):
+    """Taxonomy goal a resume is scored against: the student's interest area
+    if the taxonomy has it, else None (the default goal)"""
+    from skill_extractor import get_matcher
+    return interest if interest in get_matcher().goals else None
+
+
+def parser_version(goal=None):
+    """Cache version for a result; scores are relative to the scoring goal,
+    so only taxonomy goal names (never free text) end up in the key"""
+    return f"{PARSER_VERSION}:{scoring_goal(goal) or ''}"
+
+
+def analyze_resume(filepath, goal=None):
+    """Parse and score a resume. Runs in a pool process, so the parse time is
+    measured here and returned as 'parse_seconds' for the parent to record."""
+    start = time.perf_counter()
+    if RESUME_PARSER == 'pyresparser':
+        result = analyze_resume_pyresparser(filepath)
+    else:
+        try:
+            from resume_text import extract_text_from_resume
+            from skill_extractor import get_matcher
+            text = extract_text_from_resume(filepath)
+            # e.g. a scanned PDF: scoring nothing would report a 'done' empty analysis
+            if text.strip():
+                result = get_matcher().score(text, goal)
+            else:
+                result = {'error': "No text could be read from this resume"}
+        except Exception as e:
+            result = {'error': str(e)}
+    result['parse_seconds'] = time.perf_counter() - start
+    return result
+
+
+def analyze_resume_pyresparser(filepath):
+    try:
+        from pyresparser import ResumeParser
+        data = ResumeParser(filepath).get_extracted_data()
+        return {
+            'skills': data.get('skills', []),
+            'missing_skills': ['Git'] if 'Git' not in data.get('skills', []) else [],
+            'score': min(len(data.get('skills', [])) * 10, 100),
+            'experience': len(data.get('experience', []))
+        }
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def warm_up():
+    """Load the resume parser ahead of the first upload.
+
+    Done before forking, the loaded modules (and the compiled skill
+    matcher) are shared copy-on-write with the web workers. The resume
+    pool starts its processes from a forkserver instead, so they never
+    inherit a lock held by one of a web worker's threads.
+    """
+    try:
+        if RESUME_PARSER == 'pyresparser':
+            import pyresparser  # noqa: F401
+        else:
+            import resume_text  # noqa: F401
+            from skill_extractor import get_matcher
+            get_matcher()
+        return True
+    except Exception as e:
+        print(f"Resume parser warm-up skipped: {str(e)}")
+        return False
+
+
+class ResumeJobQueue:
+    """Runs analyze_resume in a process pool so uploads don't block a web worker.
+
+    on_done(email, job) is called from the pool's callback thread once a job
+    finishes, which is where results get written back to Firestore. Finished
+    jobs are kept for `ttl` seconds for resume_status to poll. If a pool
+    process dies the pool is replaced, and jobs it took down run once more.
+    """
+
+    def __init__(self, workers=2, on_done=None, ttl=JOB_TTL):
+        self.workers = workers
+        self.on_done = on_done
+        self.ttl = ttl
+        self._executor = None
+        self._jobs = {}
+        self._finished = deque()  # (finished at, job id), oldest first
+        self._lock = threading.Lock()
+        self.pending = 0  # submitted and not yet finished
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('forkserver'))
+        return self._executor
+
+    def _replace_pool(self, broken):
+        """Drop a broken pool so the next submit starts a fresh one"""
+        if self._executor is broken:
+            broken.shutdown(wait=False)
+            self._executor = None
+
+    def _evict(self, now):
+        while self._finished and self._finished[0][0] < now - self.ttl:
+            self._jobs.pop(self._finished.popleft()[1], None)
+
+    def submit(self, filepath, email, content_hash=None, goal=None):
+        job_id = uuid.uuid4().hex
+        job = {'id': job_id, 'email': email, 'status': 'queued', 'result': None,
+               'filepath': filepath, 'content_hash': content_hash, 'goal': scoring_goal(goal),
+               'submitted': time.time(), 'attempts': 0}
+        with self._lock:
+            self._evict(job['submitted'])
+            self._jobs[job_id] = job
+            self.pending += 1
+        self._run(job)
+        return job_id
+
+    def _run(self, job):
+        job['attempts'] += 1
+        with self._lock:
+            executor = self._pool()
+            try:
+                future = executor.submit(analyze_resume, job['filepath'], job['goal'])
+            except BrokenProcessPool:
+                self._replace_pool(executor)
+                executor = self._pool()
+                future = executor.submit(analyze_resume, job['filepath'], job['goal'])
+        job['status'] = 'running'
+        future.add_done_callback(lambda f: self._finish(job, f, executor))
+
+    def _finish(self, job, future, executor):
+        try:
+            job['result'] = future.result()
+        except BrokenProcessPool as e:
+            with self._lock:
+                self._replace_pool(executor)
+            if job['attempts'] < 2:
+                self._run(job)
+                return
+            job['result'] = {'error': str(e) or "Resume parser process died"}
+        except Exception as e:
+            job['result'] = {'error': str(e)}
+        # Measured in the pool process, so pool queueing isn't counted
+        parse_seconds = job['result'].pop('parse_seconds', None)
+        job['status'] = 'failed' if 'error' in job['result'] else 'done'
+        with self._lock:
+            self.pending -= 1
+            self._finished.append((time.time(), job['id']))
+        if parse_seconds is not None:
+            registry.observe('dependency_duration_seconds', parse_seconds,
+                             dependency='resume_parser', operation=RESUME_PARSER)
+        if self.on_done:
+            try:
+                self.on_done(job['email'], job)
+            except Exception as e:
+                print(f"Resume job {job['id']} callback failed: {str(e)}")
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+def requeue_stale(repos, queue, store, now=None, stale_after=RESUME_STALE_SECONDS):
+    """Queue again the resumes of students left 'queued' past stale_after.
+
+    Jobs only live in the process that took the upload, so a restart or
+    deploy loses them. The claim (moving resume_queued_at on) happens in a
+    transaction, so of several workers running this only one requeues a
+    student. Uploads from before resume_key was recorded can't be found
+    again and are marked failed.
+    """
+    now = now or time.time()
+    requeued = 0
+    for email, student in repos.students.query_items([('resume_status', '==', 'queued')]):
+        if (student.get('resume_queued_at') or 0) > now - stale_after:
+            continue
+
+        def claim(docs, seen=student.get('resume_queued_at')):
+            current = docs[0]
+            if not current or current.get('resume_status') != 'queued' or current.get('resume_queued_at') != seen:
+                return [None]
+            if not current.get('resume_key') or not store.exists(current['resume_key']):
+                return [dict(current, resume_status='failed',
+                             resume_feedback={'error': "Resume analysis was interrupted; please upload it again"})]
+            return [dict(current, resume_queued_at=now)]
+
+        claimed = repos.transact([(repos.students, email)], claim)[0]
+        if claimed and claimed['resume_status'] == 'queued':
+            key = claimed['resume_key']
+            queue.submit(store.path(key), email, etag_for(key), claimed.get('interests'))
+            requeued += 1
+    return requeued
+
+
+class ResumeRequeue:
+    """Runs requeue_stale on a background scheduler job"""
+
+    def __init__(self, repos, queue, store, interval_minutes=5):
+        self.repos = repos
+        self.queue = queue
+        self.store = store
+        self.interval_minutes = interval_minutes
+        self.requeued = 0
+        self._scheduler = None
+
+    def run(self):
+        try:
+            self.requeued += requeue_stale(self.repos, self.queue, self.store)
+        except Exception as e:
+            print(f"Resume requeue failed: {str(e)}")
+
+    def start(self):
+        if self._scheduler is None:
+            from apscheduler.schedulers.background import BackgroundScheduler
+            self._scheduler = BackgroundScheduler()
+            self._scheduler.add_job(self.run, 'interval', minutes=self.interval_minutes,
+                                    id='requeue_resumes', max_instances=1, coalesce=True)
+            self._scheduler.start()
+        return self
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
@@ -0,0 +1,32 @@
+import os
+
+MAX_PAGES = int(os.getenv('RESUME_MAX_PAGES', 10))
+MAX_CHARS = int(os.getenv('RESUME_MAX_CHARS', 20000))
+
+def iter_resume_text(filepath, max_pages=MAX_PAGES):
+    """Yield text a page (PDF) or paragraph (DOCX) at a time"""
+    ext = filepath.rsplit('.', 1)[-1].lower()
+    if ext == 'pdf':
+        from PyPDF2 import PdfReader
+        reader = PdfReader(filepath)
+        for i, page in enumerate(reader.pages):
+            if i >= max_pages:
+                break
+            yield page.extract_text() or ""
+    elif ext == 'docx':
+        from docx import Document
+        for paragraph in Document(filepath).paragraphs:
+            yield paragraph.text
+
+def extract_text_from_resume(filepath, max_pages=MAX_PAGES, max_chars=MAX_CHARS):
+    """Collect resume text, stopping once max_chars is reached"""
+    parts, total = [], 0
+    for chunk in iter_resume_text(filepath, max_pages):
+        if not chunk:
+            continue
+        chunk = chunk[:max_chars - total]
+        parts.append(chunk)
+        total += len(chunk)
+        if total >= max_chars:
+            break
+    return " ".join(parts)
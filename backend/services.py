@@ -0,0 +1,133 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from repositories import Repositories, backend_from_env
+from email_outbox import EmailOutbox, OutboxSender
+from mentor_cache import MentorCache
+from upload_store import UploadStore, RetentionSweeper
+from session_store import SessionPurger, store_from_env
+from resume_jobs import ResumeJobQueue, ResumeRequeue, parser_version
+from resume_cache import get_resume_cache, cache_key
+
+
+class lazy:
+    """Like functools.cached_property, but builds each value only once across threads"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = factory.__name__
+        self.lock = threading.Lock()
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if self.name not in obj.__dict__:
+            with self.lock:
+                if self.name not in obj.__dict__:
+                    obj.__dict__[self.name] = self.factory(obj)
+        return obj.__dict__[self.name]
+
+
+class Services:
+    """Service clients for one app, each created the first time it's used.
+
+    Nothing here opens a connection or starts a thread at construction, so
+    the app can be built in a pre-fork master. Background workers start in
+    start_workers(), which must run in the process that serves requests.
+    Tests and the load test can assign an attribute before first use to
+    swap a client out.
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+    @lazy
+    def repos(self):
+        return Repositories(backend_from_env(self.config['DATA_BACKEND']))
+
+    @lazy
+    def outbox(self):
+        return EmailOutbox()
+
+    @lazy
+    def outbox_sender(self):
+        return OutboxSender(self.outbox,
+                            host=self.config['MAIL_SERVER'],
+                            port=self.config['MAIL_PORT'],
+                            username=self.config['MAIL_USERNAME'],
+                            password=self.config['MAIL_PASSWORD'],
+                            use_tls=self.config['MAIL_USE_TLS'])
+
+    @lazy
+    def mentor_cache(self):
+        return MentorCache(self.repos.mentors)
+
+    @lazy
+    def mentor_index(self):
+        """Mentor matching index, kept in step with the mentors collection by ReloadingIndex"""
+        from mentor_matching import MentorIndex, ReloadingIndex
+        return ReloadingIndex(MentorIndex, self.repos.mentors)
+
+    @lazy
+    def mentor_search(self):
+        """Search index over active mentors, kept in step with the mentors collection by ReloadingIndex"""
+        from mentor_matching import ReloadingIndex
+        from mentor_search import MentorSearchIndex
+        return ReloadingIndex(MentorSearchIndex, self.repos.mentors)
+
+    @lazy
+    def qr_store(self):
+        return UploadStore(self.config['QR_FOLDER'])
+
+    @lazy
+    def upload_store(self):
+        return UploadStore(self.config['UPLOAD_FOLDER'])
+
+    @lazy
+    def upload_sweeper(self):
+        return RetentionSweeper(self.upload_store)
+
+    @lazy
+    def pending_expiry(self):
+        from availability import PendingExpiry
+        return PendingExpiry(self.repos)
+
+    @lazy
+    def session_store(self):
+        return store_from_env()
+
+    @lazy
+    def session_purger(self):
+        return SessionPurger(self.session_store)
+
+    @lazy
+    def resume_jobs(self):
+        return ResumeJobQueue(workers=self.config['RESUME_WORKERS'], on_done=self.save_resume_result)
+
+    @lazy
+    def resume_requeue(self):
+        return ResumeRequeue(self.repos, self.resume_jobs, self.upload_store)
+
+    @lazy
+    def io_pool(self):
+        return ThreadPoolExecutor(max_workers=self.config['IO_WORKERS'])
+
+    def save_resume_result(self, email, job):
+        if job['status'] == 'done' and job.get('content_hash'):
+            get_resume_cache().put(cache_key(job['content_hash'], parser_version(job.get('goal'))),
+                                   job['result'])
+        self.upload_store.mark_analyzed(job['filepath'])
+        self.repos.students.update(email, {
+            'resume_feedback': job['result'],
+            'resume_status': job['status']
+        })
+
+    def start_workers(self):
+        """Start the email sender, reminder dispatcher and the periodic cleanup jobs in this process"""
+        from reminders import get_reminder_service
+        self.outbox_sender.start()
+        get_reminder_service().start()
+        self.upload_sweeper.start()
+        self.session_purger.start()
+        self.pending_expiry.start()
+        self.resume_requeue.start()
+        return self
@@ -0,0 +1,272 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+SESSION_DB = os.getenv('SESSION_DB', 'sessions.db')
+SESSION_TTL = int(os.getenv('SESSION_TTL', 14 * 24 * 3600))
+SESSION_PURGE_HOURS = float(os.getenv('SESSION_PURGE_HOURS', 1))
+
+
+def new_version():
+    return secrets.token_hex(8)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+# --- Stores ---
+class MemoryStore:
+    """In-process LRU of session dicts with expiry"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return entry[0]
+
+    def set(self, sid, data, ttl):
+        with self._lock:
+            self._entries[sid] = (data, time.time() + ttl)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+
+class SQLiteStore:
+    """Sessions persisted locally so they survive restarts and are shared by workers.
+
+    Every write stores a new random version next to the data, so a cached
+    copy can be checked with version() without reading the data back.
+    """
+
+    def __init__(self, db_path=SESSION_DB):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires REAL NOT NULL,
+                    version TEXT
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if 'version' not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN version TEXT")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, sid):
+        return self.get_versioned(sid)[0]
+
+    def get_versioned(self, sid):
+        """(data, version), or (None, None) if missing or expired"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT data, expires, version FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None, None
+        return json.loads(row[0]), row[2]
+
+    def version(self, sid):
+        with self._connect() as conn:
+            row = conn.execute("SELECT expires, version FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[1]
+
+    def set(self, sid, data, ttl):
+        """Store data and return its new version"""
+        version = new_version()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (sid, data, expires, version) VALUES (?, ?, ?, ?)",
+                         (sid, json.dumps(data), time.time() + ttl, version))
+        return version
+
+    def delete(self, sid):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def purge_expired(self):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires < ?", (time.time(),)).rowcount
+
+
+class RedisStore:
+    """Any Redis-protocol server; needs the optional `redis` package.
+
+    The version lives under its own key (`<key>:v`) with the same expiry,
+    so checking it doesn't transfer the data. Redis expires keys itself.
+    """
+
+    def __init__(self, url, prefix='session:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, sid):
+        return self.get_versioned(sid)[0]
+
+    def get_versioned(self, sid):
+        raw, version = self.client.mget(self.prefix + sid, f"{self.prefix}{sid}:v")
+        if not raw:
+            return None, None
+        return json.loads(raw), version.decode() if version else None
+
+    def version(self, sid):
+        version = self.client.get(f"{self.prefix}{sid}:v")
+        return version.decode() if version else None
+
+    def set(self, sid, data, ttl):
+        version = new_version()
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + sid, json.dumps(data), ex=ttl)
+        pipe.set(f"{self.prefix}{sid}:v", version, ex=ttl)
+        pipe.execute()
+        return version
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid, f"{self.prefix}{sid}:v")
+
+    def purge_expired(self):
+        return 0
+
+
+class TieredStore:
+    """Memory LRU in front of a shared store; writes go to both.
+
+    Other workers write the shared store directly, so a local hit is only
+    used while its version still matches the shared one. Checking the
+    version is a small read that skips fetching and decoding the data.
+    """
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def get(self, sid):
+        entry = self.local.get(sid)
+        if entry is not None:
+            data, version = entry
+            if version is not None and self.shared.version(sid) == version:
+                return data
+        data, version = self.shared.get_versioned(sid)
+        if data is None:
+            self.local.delete(sid)
+        else:
+            self.local.set(sid, (data, version), SESSION_TTL)
+        return data
+
+    def set(self, sid, data, ttl):
+        version = self.shared.set(sid, data, ttl)
+        self.local.set(sid, (data, version), ttl)
+
+    def delete(self, sid):
+        self.local.delete(sid)
+        self.shared.delete(sid)
+
+    def purge_expired(self):
+        return self.shared.purge_expired()
+
+
+class SessionPurger:
+    """Deletes expired sessions from the store on a background scheduler job"""
+
+    def __init__(self, store, interval_hours=SESSION_PURGE_HOURS):
+        self.store = store
+        self.interval_hours = interval_hours
+        self.removed = 0
+        self._scheduler = None
+
+    def run(self):
+        try:
+            self.removed += self.store.purge_expired()
+        except Exception as e:
+            print(f"Session purge failed: {str(e)}")
+
+    def start(self):
+        if self._scheduler is None and hasattr(self.store, 'purge_expired'):
+            from apscheduler.schedulers.background import BackgroundScheduler
+            self._scheduler = BackgroundScheduler()
+            self._scheduler.add_job(self.run, 'interval', hours=self.interval_hours,
+                                    id='purge_sessions', max_instances=1, coalesce=True)
+            self._scheduler.start()
+        return self
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+
+def store_from_env():
+    """SESSION_STORE: memory, sqlite (default, with a memory LRU in front) or redis"""
+    kind = os.getenv('SESSION_STORE', 'sqlite')
+    if kind == 'memory':
+        return MemoryStore()
+    if kind == 'redis':
+        return TieredStore(MemoryStore(), RedisStore(os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0')))
+    return TieredStore(MemoryStore(), SQLiteStore())
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data on the server; the cookie only carries a random id"""
+
+    def __init__(self, store, ttl=SESSION_TTL):
+        self.store = store
+        self.ttl = ttl
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not session.modified and not self.should_set_cookie(app, session):
+            return
+        if session.modified:
+            self.store.set(session.sid, dict(session), self.ttl)
+        response.set_cookie(name, session.sid,
+                            expires=self.get_expiration_time(app, session),
+                            httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path,
+                            secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
@@ -0,0 +1,189 @@
+"""Fast resume scoring against a skill taxonomy.
+
+Every synonym in the taxonomy is compiled into one regex (a prefix trie),
+so finding a resume's skills is a single pass over its text. The score and
+missing skills are computed against the skills the student's goal needs
+(GOAL_REQUIREMENTS is keyed on the student form's interest options).
+
+Override the taxonomy with a JSON file named by SKILL_TAXONOMY:
+    {"skills": {"Python": ["python3", ...]}, "goals": {"Data Science": ["Python", ...]}}
+Entries are merged over the built-in ones.
+"""
+import json
+import os
+import re
+import threading
+
+# canonical skill -> synonyms (the canonical name always matches too)
+SKILLS = {
+    'Python': ['python3'],
+    'Java': [],
+    'JavaScript': ['js', 'ecmascript', 'es6'],
+    'TypeScript': [],
+    'C++': ['cpp'],
+    'C#': ['csharp', 'c sharp'],
+    'Go': ['golang'],
+    'Rust': [],
+    'SQL': ['mysql', 'postgresql', 'postgres', 'sqlite', 't-sql'],
+    'NoSQL': ['mongodb', 'cassandra', 'dynamodb'],
+    'HTML': ['html5'],
+    'CSS': ['css3', 'sass', 'scss'],
+    'React': ['react.js', 'reactjs'],
+    'Node.js': ['nodejs'],
+    'Django': [],
+    'Flask': [],
+    'REST APIs': ['restful', 'rest api', 'rest apis'],
+    'Git': ['github', 'gitlab'],
+    'Docker': [],
+    'Kubernetes': ['k8s'],
+    'AWS': ['amazon web services', 'ec2', 's3'],
+    'GCP': ['google cloud'],
+    'Azure': [],
+    'Linux': ['unix', 'bash'],
+    'CI/CD': ['jenkins', 'github actions', 'continuous integration'],
+    'Data Structures': ['algorithms', 'dsa'],
+    'System Design': ['distributed systems'],
+    'Testing': ['unit testing', 'pytest', 'junit', 'tdd'],
+    'Pandas': [],
+    'NumPy': [],
+    'Statistics': ['statistical analysis', 'probability'],
+    'Machine Learning': ['ml', 'scikit-learn', 'sklearn'],
+    'Deep Learning': ['neural networks', 'cnn', 'rnn', 'transformers'],
+    'TensorFlow': ['keras'],
+    'PyTorch': ['torch'],
+    'NLP': ['natural language processing'],
+    'Computer Vision': ['opencv'],
+    'Data Visualization': ['matplotlib', 'seaborn', 'tableau', 'power bi'],
+    'Excel': [],
+    'Spark': ['pyspark', 'hadoop'],
+    'Networking': ['tcp/ip', 'dns', 'network security'],
+    'Cryptography': ['encryption', 'pki'],
+    'Penetration Testing': ['pentesting', 'ethical hacking', 'burp suite', 'metasploit'],
+    'SIEM': ['splunk'],
+    'Security': ['cybersecurity', 'owasp', 'vulnerability assessment'],
+    'Figma': [],
+    'Adobe XD': [],
+    'Photoshop': ['adobe photoshop'],
+    'Illustrator': ['adobe illustrator'],
+    'UI Design': ['ui', 'user interface'],
+    'UX Research': ['ux', 'user research', 'usability testing'],
+    'Prototyping': ['wireframing', 'wireframes'],
+}
+
+# Names that are also ordinary words only match with this exact casing
+CASE_SENSITIVE = {'Go', 'Excel'}
+
+# goal -> skills it needs; DEFAULT_GOAL covers goals not listed
+GOAL_REQUIREMENTS = {
+    'Software Development': ['Python', 'Java', 'JavaScript', 'SQL', 'Git', 'Data Structures',
+                             'REST APIs', 'Testing', 'Docker', 'System Design'],
+    'Data Science': ['Python', 'SQL', 'Pandas', 'NumPy', 'Statistics', 'Machine Learning',
+                     'Data Visualization', 'Git'],
+    'Cybersecurity': ['Linux', 'Networking', 'Python', 'Security', 'Cryptography',
+                      'Penetration Testing', 'SIEM', 'Git'],
+    'AI/ML': ['Python', 'Machine Learning', 'Deep Learning', 'PyTorch', 'TensorFlow', 'NumPy',
+              'Statistics', 'NLP', 'Git'],
+    'Design': ['Figma', 'UI Design', 'UX Research', 'Prototyping', 'Adobe XD', 'Photoshop', 'HTML', 'CSS'],
+}
+DEFAULT_GOAL = 'Software Development'
+
+# Share of the score from covering the goal's skills; the rest rewards breadth
+COVERAGE_WEIGHT = 70
+BREADTH_TARGET = 15
+
+# "2019 - 2021", "Jan 2020 – Present": one per role held
+EXPERIENCE_PATTERN = re.compile(
+    r'\b(?:19|20)\d{2}\s*(?:-|–|—|to)\s*(?:(?:19|20)\d{2}|present|current|now)\b', re.IGNORECASE)
+
+
+def trie_pattern(words):
+    """Regex alternation for words factored into a prefix trie.
+
+    re tries alternatives one by one at every position; sharing prefixes
+    means each position costs one branch per character instead of one
+    attempt per word. Longer words still win since every suffix is greedy.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        group = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{group})?' if '' in node else group
+
+    return build(trie)
+
+
+class SkillMatcher:
+    """Taxonomy compiled to one regex; each match maps back to its canonical skill"""
+
+    def __init__(self, skills=SKILLS, goals=GOAL_REQUIREMENTS):
+        self.goals = goals
+        self.order = list(skills)
+        self.canonical = {}
+        for skill, synonyms in skills.items():
+            for name in [skill, *synonyms]:
+                self.canonical[name.casefold()] = skill
+        exact = [name for name in CASE_SENSITIVE if name.casefold() in self.canonical]
+        folded = set(self.canonical) - {name.casefold() for name in exact}
+        alternation = trie_pattern(folded)
+        if exact:
+            alternation = f"(?-i:{'|'.join(map(re.escape, exact))})|{alternation}"
+        # No word character may touch either end, and "+"/"#" can't follow
+        # (so "C" won't match "C++"), nor ".x" (so "React" is not read from "React.Native")
+        self.pattern = re.compile(rf'(?<![\w.+#])(?:{alternation})(?![\w+#]|\.\w)', re.IGNORECASE)
+
+    def extract(self, text):
+        """Canonical skills found in text, in taxonomy order"""
+        found = {self.canonical[m.group(0).casefold()] for m in self.pattern.finditer(text)}
+        return [s for s in self.order if s in found]
+
+    def required(self, goal):
+        return self.goals.get(goal) or self.goals.get(DEFAULT_GOAL, [])
+
+    def score(self, text, goal=None):
+        """Skills, goal-relative score (0-100), missing skills and experience entries"""
+        skills = self.extract(text)
+        required = self.required(goal)
+        have = set(skills)
+        missing = [s for s in required if s not in have]
+        coverage = (len(required) - len(missing)) / len(required) if required else 1.0
+        breadth = min(len(skills), BREADTH_TARGET) / BREADTH_TARGET
+        return {
+            'skills': skills,
+            'missing_skills': missing,
+            'score': round(COVERAGE_WEIGHT * coverage + (100 - COVERAGE_WEIGHT) * breadth),
+            'experience': len(EXPERIENCE_PATTERN.findall(text)),
+            'goal': goal,
+        }
+
+
+def load_taxonomy(path=None):
+    """Built-in taxonomy, with a JSON override file merged over it"""
+    skills, goals = dict(SKILLS), dict(GOAL_REQUIREMENTS)
+    path = path or os.getenv('SKILL_TAXONOMY')
+    if path:
+        with open(path) as f:
+            custom = json.load(f)
+        skills.update(custom.get('skills', {}))
+        goals.update(custom.get('goals', {}))
+    return skills, goals
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher():
+    """Process-wide matcher, compiled on first use"""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = SkillMatcher(*load_taxonomy())
+        return _matcher
@@ -0,0 +1,100 @@
+"""Startup benchmark: how long a fresh worker takes to import and build the app.
+
+Each run is a new interpreter, so nothing is cached between runs. Reports
+the median time to `import app`, `create_app()`, `warm_up()` and the first
+request, plus the slowest modules from `python -X importtime`.
+
+    python startup_bench.py --runs 5
+    python startup_bench.py --runs 5 --out startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+app = app_module.create_app(start_workers=False)
+created = time.perf_counter()
+if {warm}:
+    app_module.warm_up(app)
+warmed = time.perf_counter()
+app.test_client().get('/metrics')
+served = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'warm_up_ms': (warmed - created) * 1000,
+    'first_request_ms': (served - warmed) * 1000,
+    'modules': len(sys.modules),
+}}))
+"""
+
+
+def probe_env(workdir):
+    env = dict(os.environ)
+    env.setdefault('DATA_BACKEND', 'memory')
+    for name, filename in (('REMINDER_DB', 'reminders.db'), ('RESUME_CACHE_DB', 'resume_cache.db'),
+                           ('OUTBOX_DB', 'outbox.db'), ('SESSION_DB', 'sessions.db')):
+        env.setdefault(name, os.path.join(workdir, filename))
+    env['PYTHONPATH'] = os.path.dirname(os.path.abspath(__file__)) + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def run_once(env, workdir, warm):
+    result = subprocess.run([sys.executable, '-c', PROBE.format(warm=warm)], env=env, cwd=workdir,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env, workdir, top):
+    """(cumulative_ms, module) for top-level imports made by `import app`"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], env=env, cwd=workdir,
+                            capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Only modules imported directly by app (two spaces of indent)
+        if name.startswith('   ') and not name.startswith('    '):
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="slowest imports to list")
+    parser.add_argument('--no-warm-up', action='store_true', help="skip warm_up()")
+    parser.add_argument('--out', help="write results JSON here")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='startup-')
+    env = probe_env(workdir)
+    runs = [run_once(env, workdir, not args.no_warm_up) for _ in range(args.runs)]
+    medians = {key: round(statistics.median(r[key] for r in runs), 1)
+               for key in ('import_ms', 'create_app_ms', 'warm_up_ms', 'first_request_ms')}
+    imports = slowest_imports(env, workdir, args.top)
+
+    for key, value in medians.items():
+        print(f"{key:<18}{value:>9.1f}")
+    print(f"{'modules loaded':<18}{runs[-1]['modules']:>9}")
+    print("\nslowest imports from `import app` (cumulative ms):")
+    for ms, name in imports:
+        print(f"  {ms:>8.1f}  {name}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'runs': runs, 'median': medians,
+                       'slowest_imports': imports}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
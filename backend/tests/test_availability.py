@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+from availability import (BookingIndex, SlotUnavailable, book_session, parse_session_time,
+                          record_payment_update, release_session, windows_for_day)
+from mentor_summary import record_session_change
+from repositories import Repositories, MemoryBackend
+
+DAY = datetime(2031, 1, 6)  # a Monday
+
+
+def at(hour, minute=0):
+    return DAY + timedelta(hours=hour, minutes=minute)
+
+
+def test_conflict_detects_overlap_but_not_touching_intervals():
+    index = BookingIndex()
+    index.add(at(10), at(11), 's1')
+    index.add(at(13), at(14), 's2')
+
+    assert index.conflict(at(10, 30), at(11, 30)) == 's1'
+    assert index.conflict(at(9), at(13, 30)) in ('s1', 's2')
+    assert index.conflict(at(12, 30), at(13, 30)) == 's2'
+    assert index.conflict(at(11), at(13)) is None
+    assert index.conflict(at(9), at(10)) is None
+    with pytest.raises(SlotUnavailable):
+        index.add(at(10, 30), at(11), 's3')
+
+
+def test_remove_and_prune_free_the_time():
+    index = BookingIndex()
+    index.add(at(10), at(11), 's1')
+    index.add(at(13), at(14), 's2')
+
+    index.remove('s2')
+    assert index.conflict(at(13), at(14)) is None
+    index.prune(at(11))
+    assert index.ids == []
+
+
+def test_round_trips_through_the_stored_document():
+    index = BookingIndex()
+    index.add(at(10), at(11), 's1')
+    restored = BookingIndex.from_doc(index.to_doc())
+    assert restored.conflict(at(10), at(10, 30)) == 's1'
+
+
+def test_free_slots_skip_bookings_and_stay_on_the_grid():
+    index = BookingIndex()
+    index.add(at(9, 15), at(10), 's1')
+    windows = windows_for_day(['weekday_mornings'], DAY)  # 8:00-12:00
+
+    slots = index.free_slots(windows, minutes=60)
+
+    assert slots[0] == (at(8), at(9))
+    starts = [s for s, _ in slots]
+    assert at(8, 30) not in starts  # would overlap the 9:15 booking
+    assert starts[1] == at(10)  # first grid point after the booking ends
+    assert slots[-1] == (at(11), at(12))
+    assert all(index.conflict(s, e) is None for s, e in slots)
+
+
+def test_parse_session_time_normalizes_offsets_and_rejects_bad_input():
+    date, duration = parse_session_time('2031-01-06T10:00:00+00:00', '60')
+    assert datetime.fromisoformat(date).tzinfo is None
+    assert duration == 60
+    for bad_date, bad_duration in (('not a date', '60'), ('2031-01-06T10:00', '0'),
+                                   ('2031-01-06T10:00', '1000')):
+        with pytest.raises(ValueError):
+            parse_session_time(bad_date, bad_duration)
+
+
+def booked(repos, when=None):
+    when = when or datetime.now() + timedelta(days=2)
+    when = when.replace(hour=10, minute=0, second=0, microsecond=0)
+    mentor = {'email': 'm@example.com', 'availability': []}
+    session = {'mentor_email': 'm@example.com', 'student_email': 's@example.com',
+               'date': when.isoformat(), 'duration': 60, 'status': 'pending',
+               'created_at': datetime.now().isoformat()}
+    return book_session(repos, 's1', session, mentor), when
+
+
+@pytest.fixture
+def repos():
+    return Repositories(MemoryBackend())
+
+
+def test_expired_checkout_releases_an_accepted_session(repos, monkeypatch):
+    import availability
+    monkeypatch.setattr(availability, 'within_availability', lambda *args: True)
+    _, when = booked(repos)
+    record_session_change(repos, 's1', {'status': 'accepted', 'payment_id': 'cs_1'},
+                          from_status=('pending', 'accepted'))
+
+    record_payment_update(repos, 's1', {'payment_status': 'expired', 'payment_id': 'cs_1'})
+
+    assert repos.sessions.get('s1')['status'] == 'expired'
+    index = BookingIndex.from_doc(repos.mentor_bookings.get('m@example.com'))
+    assert index.conflict(when, when + timedelta(hours=1)) is None
+
+
+def test_accept_guard_leaves_a_declined_session_alone(repos, monkeypatch):
+    import availability
+    monkeypatch.setattr(availability, 'within_availability', lambda *args: True)
+    booked(repos)
+    release_session(repos, 's1', {'status': 'declined'})
+
+    assert record_session_change(repos, 's1', {'status': 'accepted'},
+                                 from_status=('pending', 'accepted')) is None
+    assert repos.sessions.get('s1')['status'] == 'declined'
+    # A later event for the withdrawn checkout is still recorded, without reviving it
+    record_payment_update(repos, 's1', {'payment_status': 'expired'})
+    assert repos.sessions.get('s1')['status'] == 'declined'
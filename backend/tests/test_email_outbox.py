@@ -0,0 +1,67 @@
+import socket
+import threading
+
+import pytest
+from email_outbox import EmailOutbox, OutboxSender
+
+controller = pytest.importorskip('aiosmtpd.controller')
+
+
+class Recorder:
+    def __init__(self):
+        self.recipients = []
+        self.lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            self.recipients.extend(envelope.rcpt_tos)
+        return '250 OK'
+
+
+@pytest.fixture
+def smtp_server():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    handler = Recorder()
+    server = controller.Controller(handler, hostname='127.0.0.1', port=port)
+    server.start()
+    yield handler, port
+    server.stop()
+
+
+def test_concurrent_senders_send_each_message_once(tmp_path, smtp_server):
+    handler, port = smtp_server
+    db = str(tmp_path / 'outbox.db')
+    outbox = EmailOutbox(db)
+    for i in range(120):
+        outbox.enqueue(f"user{i}@example.com", "Hello", "Body")
+
+    # One sender per gunicorn worker, each with its own connection to the table
+    senders = [OutboxSender(EmailOutbox(db), '127.0.0.1', port, use_tls=False,
+                            sender='app@example.com', batch_size=10) for _ in range(3)]
+
+    def drain(sender):
+        while sender.send_batch():
+            pass
+
+    threads = [threading.Thread(target=drain, args=(s,)) for s in senders]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(handler.recipients) == sorted(f"user{i}@example.com" for i in range(120))
+    assert outbox.counts() == {'sent': 120}
+    assert sum(s.sent for s in senders) == 120
+
+
+def test_claimed_rows_are_not_claimed_again_until_stale(tmp_path):
+    db = str(tmp_path / 'outbox.db')
+    outbox = EmailOutbox(db)
+    outbox.enqueue('a@example.com', 'Hello', 'Body')
+
+    assert len(outbox.claim(10)) == 1
+    assert outbox.claim(10) == []
+    # A sender that died mid-batch leaves the row 'sending'; it comes back once stale
+    assert len(EmailOutbox(db, claim_timeout=0).claim(10)) == 1
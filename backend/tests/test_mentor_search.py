@@ -0,0 +1,69 @@
+import pytest
+from mentor_search import MentorSearchIndex, decode_cursor
+
+
+def mentor(n, **fields):
+    data = {'email': f"m{n:03d}@example.com", 'status': 'active', 'hourly_charge': n % 7 * 10,
+            'skills': ['Python'] if n % 3 == 0 else ['Java'], 'current_role': 'Engineer',
+            'availability': ['Mon']}
+    data.update(fields)
+    return data
+
+
+def all_pages(index, **filters):
+    pages, cursor = [], None
+    while True:
+        page, cursor = index.search(cursor=cursor, limit=7, **filters)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def index():
+    return MentorSearchIndex().load(mentor(n) for n in range(60))
+
+
+def test_pages_cover_every_mentor_once_in_price_order(index):
+    pages = all_pages(index)
+    results = [m for page in pages for m in page]
+
+    assert len(results) == 60
+    assert len({m['email'] for m in results}) == 60
+    keys = [(float(m['hourly_charge']), m['email']) for m in results]
+    assert keys == sorted(keys)
+    assert all(len(page) == 7 for page in pages[:-1])
+
+
+def test_filtered_pages_match_an_unpaginated_filter(index):
+    # Few matches: the filtered set is sorted rather than walking the price list
+    results = [m for page in all_pages(index, skills=['Python'], min_price=10) for m in page]
+    expected = sorted((float(m['hourly_charge']), m['email']) for m in (mentor(n) for n in range(60))
+                      if 'Python' in m['skills'] and m['hourly_charge'] >= 10)
+    assert [(float(m['hourly_charge']), m['email']) for m in results] == expected
+
+
+def test_writes_between_pages_do_not_repeat_or_skip_earlier_results(index):
+    first, cursor = index.search(limit=10)
+    index.upsert(mentor(0, hourly_charge=1000))  # moves from the first page to the end
+    rest = []
+    while cursor:
+        page, cursor = index.search(cursor=cursor, limit=10)
+        rest.extend(page)
+
+    seen = [m['email'] for m in first + rest]
+    assert len(seen) == len(set(seen)) + 1  # only the moved mentor shows twice
+    assert len(set(seen)) == 60
+
+
+def test_inactive_mentors_are_dropped(index):
+    index.upsert(mentor(3, status='inactive'))
+    results = [m['email'] for page in all_pages(index) for m in page]
+    assert 'm003@example.com' not in results
+
+
+def test_malformed_cursor_raises_value_error(index):
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+    with pytest.raises(ValueError):
+        index.search(cursor='@@@')
@@ -0,0 +1,59 @@
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from payments import parse_webhook, payment_update_for_event
+
+
+def event(type_, **checkout):
+    obj = {'id': 'cs_test_1', 'object': 'checkout.session'}
+    obj.update(checkout)
+    return {'id': 'evt_1', 'object': 'event', 'type': type_, 'data': {'object': obj}}
+
+
+def test_paid_checkout_completes_the_session():
+    update = payment_update_for_event(event('checkout.session.completed', payment_status='paid',
+                                            metadata={'session_id': 's1'}))
+    assert update == ('s1', {'payment_status': 'completed', 'payment_id': 'cs_test_1',
+                             'payment_event_id': 'evt_1'})
+
+
+def test_unpaid_completion_waits_for_the_async_payment():
+    assert payment_update_for_event(event('checkout.session.completed', payment_status='unpaid',
+                                          metadata={'session_id': 's1'})) is None
+    update = payment_update_for_event(event('checkout.session.async_payment_succeeded',
+                                            metadata={'session_id': 's1'}))
+    assert update[1]['payment_status'] == 'completed'
+
+
+def test_session_id_falls_back_to_client_reference_id():
+    update = payment_update_for_event(event('checkout.session.expired', client_reference_id='s2'))
+    assert update[0] == 's2'
+    assert update[1]['payment_status'] == 'expired'
+
+
+def test_ignored_events():
+    assert payment_update_for_event(event('customer.created')) is None
+    assert payment_update_for_event(event('checkout.session.expired')) is None
+
+
+def test_malformed_event_raises():
+    with pytest.raises((KeyError, TypeError)):
+        payment_update_for_event({'id': 'evt_1', 'type': 'checkout.session.expired'})
+
+
+def test_parse_webhook_returns_a_plain_dict():
+    pytest.importorskip('stripe')
+    payload = json.dumps(event('checkout.session.completed', payment_status='paid',
+                               metadata={'session_id': 's1'}))
+    timestamp = int(time.time())
+    signature = hmac.new(b'whsec_test', f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+
+    parsed = parse_webhook(payload, f"t={timestamp},v1={signature}", 'whsec_test')
+
+    assert isinstance(parsed, dict)
+    assert payment_update_for_event(parsed)[0] == 's1'
+    with pytest.raises(Exception):
+        parse_webhook(payload, f"t={timestamp},v1={'0' * 64}", 'whsec_test')
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from reminders import ReminderService, REMINDER_INTERVAL
+
+
+def test_dispatchers_sharing_a_table_send_each_reminder_once(tmp_path):
+    db = str(tmp_path / 'reminders.db')
+    sent = []
+    lock = threading.Lock()
+
+    def send(email):
+        with lock:
+            sent.append(email)
+
+    services = [ReminderService(db, send=send, batch_size=20) for _ in range(3)]
+    for i in range(200):
+        services[0].schedule(f"student{i}@example.com")
+
+    due = time.time() + REMINDER_INTERVAL.total_seconds() + 1
+    threads = [threading.Thread(target=s.dispatch_due, args=(due,)) for s in services]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(sent) == sorted(f"student{i}@example.com" for i in range(200))
+    # Each row moved on to next week, so nothing is due again yet
+    assert services[0].dispatch_due(due) == 0
+
+
+def test_missed_weeks_are_sent_once(tmp_path):
+    sent = []
+    service = ReminderService(str(tmp_path / 'reminders.db'), send=sent.append)
+    service.schedule('a@example.com')
+
+    assert service.dispatch_due(time.time() + 5 * REMINDER_INTERVAL.total_seconds()) == 1
+    assert sent == ['a@example.com']
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+import upload_store
+from upload_store import UploadStore
+
+
+def test_sweep_skips_files_another_worker_removed(tmp_path, monkeypatch):
+    store = UploadStore(str(tmp_path))
+    keys = [store.put_bytes(b'%PDF-' + bytes([i]), 'pdf') for i in range(5)]
+    for key in keys:
+        store.mark_analyzed(store.path(key))
+    scandir = os.scandir
+
+    def listed_then_swept_elsewhere(path):
+        entries = list(scandir(path))
+        if path != store.root:
+            for entry in entries[:1]:
+                os.remove(entry.path)
+        return iter(entries)
+
+    monkeypatch.setattr(upload_store.os, 'scandir', listed_then_swept_elsewhere)
+    store.sweep(max_age=-1)
+
+    assert not any(store.exists(key) for key in keys)
+
+
+def test_restoring_swept_content_keeps_the_new_copy(tmp_path):
+    store = UploadStore(str(tmp_path))
+    key = store.put_bytes(b'%PDF-1', 'pdf')
+    assert store.sweep(max_age=-1) == 1
+
+    assert store.put_bytes(b'%PDF-1', 'pdf') == key
+    assert store.exists(key)
+
+
+def test_save_upload_trusts_bytes_not_names(tmp_path):
+    from io import BytesIO
+    from werkzeug.datastructures import FileStorage
+
+    store = UploadStore(str(tmp_path))
+    key, _ = store.save_upload(FileStorage(BytesIO(b'%PDF-1.4 resume'), 'resume.docx'))
+    assert key.endswith('.pdf')
+    # Legacy Word files have no text extractor, so they're refused up front
+    legacy = FileStorage(BytesIO(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'0' * 50), 'resume.doc')
+    with pytest.raises(ValueError):
+        store.save_upload(legacy)
@@ -0,0 +1,116 @@
+import contextlib
+import itertools
+import os
+import time
+import zipfile
+from content_store import ContentStore, CHUNK_SIZE
+
+RESUME_RETENTION_DAYS = float(os.getenv('RESUME_RETENTION_DAYS', 30))
+
+# Leading bytes of each type we recognise; DOCX is a zip container. Legacy
+# .doc is detected only to be rejected, as there is no text extractor for it
+SIGNATURES = [
+    (b'%PDF-', 'pdf'),
+    (b'PK\x03\x04', 'docx'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'doc'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+]
+
+
+def sniff_file_type(head):
+    for signature, kind in SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    return None
+
+
+def is_docx(path):
+    """True if the zip at path is a Word document, not just any zip"""
+    try:
+        with zipfile.ZipFile(path) as z:
+            names = set(z.namelist())
+    except zipfile.BadZipFile:
+        return False
+    return '[Content_Types].xml' in names and 'word/document.xml' in names
+
+
+class UploadStore(ContentStore):
+    """Content-addressed upload storage that trusts file bytes, not file names"""
+
+    def save_upload(self, file, allowed=('pdf', 'docx'), chunk_size=CHUNK_SIZE):
+        """Stream an upload into the store; returns (key, sha256)"""
+        chunks = iter(lambda: file.stream.read(chunk_size), b'')
+        head = next(chunks, b'')
+        kind = sniff_file_type(head)
+        if kind not in allowed:
+            raise ValueError(f"Unsupported file type for {file.filename} "
+                             f"(expected {' or '.join(a.upper() for a in allowed)})")
+
+        def check(path):
+            if kind == 'docx' and not is_docx(path):
+                raise ValueError(f"Unsupported file type for {file.filename}")
+
+        key = self.put_chunks(itertools.chain([head], chunks), kind, check)
+        return key, key.split('/')[1].split('.')[0]
+
+    def mark_analyzed(self, path):
+        """Flag a stored file as processed so the retention sweep may delete it"""
+        open(path + '.done', 'a').close()
+
+    def sweep(self, max_age, orphan_age=None, now=None):
+        """Delete analyzed files older than max_age seconds (unanalyzed ones after orphan_age)"""
+        now = now or time.time()
+        orphan_age = orphan_age or max_age * 2
+        removed = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir() or len(shard.name) != 2:
+                if shard.name.endswith('.part'):
+                    # Another worker's sweep (or commit) may have removed it already
+                    with contextlib.suppress(FileNotFoundError):
+                        if now - shard.stat().st_mtime > 86400:
+                            os.remove(shard.path)
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.done'):
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    age = now - entry.stat().st_mtime
+                    done = os.path.exists(entry.path + '.done')
+                    if age > (max_age if done else orphan_age):
+                        os.remove(entry.path)
+                        removed += 1
+                        if done:
+                            os.remove(entry.path + '.done')
+        return removed
+
+
+class RetentionSweeper:
+    """Runs UploadStore.sweep on a single background scheduler job"""
+
+    def __init__(self, store, max_age_days=RESUME_RETENTION_DAYS, interval_hours=1):
+        self.store = store
+        self.max_age = max_age_days * 86400
+        self.interval_hours = interval_hours
+        self.removed = 0
+        self._scheduler = None
+
+    def run(self):
+        try:
+            self.removed += self.store.sweep(self.max_age)
+        except Exception as e:
+            print(f"Upload sweep failed: {str(e)}")
+
+    def start(self):
+        if self._scheduler is None:
+            from apscheduler.schedulers.background import BackgroundScheduler
+            self._scheduler = BackgroundScheduler()
+            self._scheduler.add_job(self.run, 'interval', hours=self.interval_hours,
+                                    id='sweep_uploads', max_instances=1, coalesce=True)
+            self._scheduler.start()
+        return self
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
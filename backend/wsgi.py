@@ -0,0 +1,7 @@
+"""WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:app"""
+import os
+from app import create_app, warm_up
+
+app = create_app(start_workers=False)
+if os.getenv('WARM_UP', '1') == '1':
+    warm_up(app)